@@ -0,0 +1,151 @@
+"""基于本地模拟网关的KNX性能测试
+
+在后台线程中运行knx_gateway_sim.FakeKNXGateway，测量:
+  - 扫描耗时(GatewayDiscovery)
+  - 隧道连接耗时(KNXClient.connect)
+  - main.py的发送路径: 界面线程build_telegram + client.submit(send_telegram)
+  - knx_ip_send.py的批量发送路径: send_batch
+  - 多路由器负载均衡: send_batch_pool(--gateways N个模拟网关)
+并输出吞吐量和p50/p99确认延迟。
+
+用法: python benchmarks/bench_knx_gateway.py [--telegrams 500] [--latency 2] [--loss 0.01] [--gateways 3]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from knx_client import KNXClient, build_telegram  # noqa: E402
+from knx_discovery import GatewayDiscovery  # noqa: E402
+from knx_gateway_sim import FakeKNXGateway  # noqa: E402
+from knx_ip_send import send_batch, send_batch_pool  # noqa: E402
+from knx_metrics import percentile  # noqa: E402
+
+LOCAL_IP = "127.0.0.1"
+
+
+class SimulatorThread:
+    """在独立的事件循环线程中运行模拟网关，与被测客户端互不影响"""
+
+    def __init__(self, **options):
+        self.gateway = FakeKNXGateway(LOCAL_IP, 0, **options)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="KNXGatewaySim", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self.gateway.start(), self.loop).result()
+        except BaseException:
+            # 启动失败时不会调用__exit__，在这里停止事件循环线程
+            self._stop_loop()
+            raise
+        return self.gateway
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.loop.call_soon_threadsafe(self.gateway.stop)
+        self._stop_loop()
+
+    def _stop_loop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+
+
+def report(name, count, duration, latencies, failures=0):
+    ms = sorted(latency * 1000 for latency in latencies)
+    print(f"{name}: {count} 条, {count / duration:.0f} 条/s, "
+          f"p50 {percentile(ms, 0.5):.2f} ms, p99 {percentile(ms, 0.99):.2f} ms, 失败 {failures}")
+
+
+async def bench_scan(port, rounds):
+    durations = []
+    for _ in range(rounds):
+        discovery = GatewayDiscovery(LOCAL_IP, expected_count=1, search_address=(LOCAL_IP, port))
+        await discovery.run()
+        durations.append(discovery.duration)
+    report_ms = sorted(d * 1000 for d in durations)
+    print(f"扫描: p50 {percentile(report_ms, 0.5):.2f} ms, 最大 {report_ms[-1]:.2f} ms")
+
+
+async def bench_connect(port, rounds):
+    durations = []
+    for _ in range(rounds):
+        async with KNXClient(local_ip=LOCAL_IP) as client:
+            connection = await client.connect(LOCAL_IP, port)
+            durations.append(connection.connect_time)
+    report_ms = sorted(d * 1000 for d in durations)
+    print(f"连接: p50 {percentile(report_ms, 0.5):.2f} ms, 最大 {report_ms[-1]:.2f} ms")
+
+
+def bench_ui_path(port, count):
+    """与KNXControllerApp.send_knx_command相同: 在调用线程编码，提交到客户端的后台事件循环"""
+    client = KNXClient(local_ip=LOCAL_IP)
+    client.start()
+    try:
+        client.submit(client.connect(LOCAL_IP, port)).result()
+        latencies = []
+        failures = 0
+        start_time = time.perf_counter()
+        for i in range(count):
+            telegram = build_telegram("1/1/1", i % 2)
+            future = client.submit(client.send_telegram(telegram, LOCAL_IP, port, LOCAL_IP))
+            try:
+                latencies.append(future.result())
+            except Exception:
+                failures += 1
+        report("main.py发送", count, time.perf_counter() - start_time, latencies, failures)
+    finally:
+        client.stop()
+
+
+def bench_batch_path(port, count):
+    commands = [(f"1/1/{i % 250}", "1.001", i % 2) for i in range(count)]
+    batch = asyncio.run(send_batch(commands, LOCAL_IP, LOCAL_IP, port, rate_limit=0))
+    report("knx_ip_send批量发送", batch.total, batch.duration, batch.latencies, len(batch.failures))
+
+
+def bench_pool_path(ports, count):
+    commands = [(f"1/1/{i % 250}", "1.001", i % 2) for i in range(count)]
+    gateways = [{"ip": LOCAL_IP, "port": port} for port in ports]
+    batch, stats = asyncio.run(send_batch_pool(commands, LOCAL_IP, gateways, rate_limit=0))
+    report(f"负载均衡({len(ports)}个路由器)", batch.total, batch.duration, batch.latencies, len(batch.failures))
+    print("  各路由器: " + ", ".join(str(item["sent"]) for item in stats))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于模拟网关的KNX性能测试")
+    parser.add_argument("--telegrams", type=int, default=500, help="每项发送测试的报文数")
+    parser.add_argument("--rounds", type=int, default=20, help="扫描和连接测试的次数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟网关每个回复的延迟(毫秒)")
+    parser.add_argument("--confirm-delay", type=float, default=0.0, help="模拟总线发送时间(毫秒)")
+    parser.add_argument("--loss", type=float, default=0.0, help="模拟网关丢弃请求的概率")
+    parser.add_argument("--gateways", type=int, default=1, help="负载均衡测试的模拟网关数(1表示不测试)")
+    args = parser.parse_args()
+
+    with SimulatorThread(latency=args.latency / 1000, loss=args.loss,
+                         confirm_delay=args.confirm_delay / 1000, seed=1) as gateway:
+        print(f"模拟网关 {LOCAL_IP}:{gateway.port}, 延迟 {args.latency} ms, "
+              f"总线 {args.confirm_delay} ms, 丢包 {args.loss:.1%}")
+        asyncio.run(bench_scan(gateway.port, args.rounds))
+        asyncio.run(bench_connect(gateway.port, args.rounds))
+        bench_ui_path(gateway.port, args.telegrams)
+        bench_batch_path(gateway.port, args.telegrams)
+        if args.gateways > 1:
+            # 只关闭已经启动的模拟网关，某个启动失败时保留原来的异常
+            with contextlib.ExitStack() as stack:
+                ports = [gateway.port] + [
+                    stack.enter_context(SimulatorThread(latency=args.latency / 1000, loss=args.loss,
+                                                        confirm_delay=args.confirm_delay / 1000, seed=i)).port
+                    for i in range(2, args.gateways + 1)
+                ]
+                bench_pool_path(ports, args.telegrams)
+        print(f"模拟网关共收到 {gateway.telegrams_received} 条报文，丢弃 {gateway.requests_dropped} 个请求")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""NFC串口帧解析微基准
+
+比较旧的切片解析和nfc_frame.NFCFrameParser在不同分块大小下的帧/秒，
+并与各波特率下串口能传输的最大帧率对比。
+
+用法: python benchmarks/bench_nfc_frame.py [--frames 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from nfc_frame import FRAME_LENGTH, MODE_DELIMITED, MODE_FIXED, NFCFrameParser  # noqa: E402
+
+BAUD_RATES = (115200, 921600, 3000000)
+# 8N1: 每字节10位
+BITS_PER_BYTE = 10
+
+
+def make_stream(frame_count, seed=1):
+    """生成frame_count帧随机卡号，其中部分卡号包含\\r\\n"""
+    rng = random.Random(seed)
+    frames = []
+    for i in range(frame_count):
+        uid = bytes(rng.getrandbits(8) for _ in range(4))
+        if i % 100 == 0:
+            uid = b"\r\n" + uid[2:]
+        frames.append(uid + b"\r\n")
+    return b"".join(frames)
+
+
+def legacy_parse(chunks):
+    """旧的解析方式：每帧都重新切片剩余的缓冲区"""
+    buffer = bytearray()
+    frames = 0
+    for data in chunks:
+        buffer.extend(data)
+        while b"\r\n" in buffer:
+            end_index = buffer.index(b"\r\n")
+            card_bytes = buffer[:end_index]
+            buffer = buffer[end_index + 2:]
+            if len(card_bytes) == 4:
+                "".join(f"{b:02X}" for b in card_bytes)
+                frames += 1
+    return frames
+
+
+def parser_parse(chunks, mode):
+    parser = NFCFrameParser(mode)
+    frames = 0
+    for data in chunks:
+        for card_id, _ in parser.feed(data):
+            if card_id is not None:
+                frames += 1
+    return frames
+
+
+def split(stream, chunk_size):
+    return [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    frames = function(*args)
+    return frames, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NFC串口帧解析微基准")
+    parser.add_argument("--frames", type=int, default=200000, help="生成的帧数")
+    parser.add_argument("--burst-frames", type=int, default=20000,
+                        help="一次性到达的突发数据帧数(旧算法为平方复杂度，不宜过大)")
+    args = parser.parse_args()
+
+    stream = make_stream(args.frames)
+    print(f"{args.frames} 帧, {len(stream)} 字节")
+    for baud in BAUD_RATES:
+        print(f"  {baud} 波特最多 {baud / BITS_PER_BYTE / FRAME_LENGTH:.0f} 帧/秒")
+    print()
+
+    # 1字节: 最坏情况；12字节: 115200波特下约1ms的数据量；4096字节: 大块读取
+    print(f"{'分块':>8} {'旧算法':>14} {'分隔模式':>14} {'定长模式':>14}")
+    for chunk_size in (1, 12, 4096):
+        chunks = split(stream, chunk_size)
+        row = [f"{chunk_size:>8}"]
+        for function, extra in ((legacy_parse, ()), (parser_parse, (MODE_DELIMITED,)),
+                                (parser_parse, (MODE_FIXED,))):
+            frames, elapsed = measure(function, chunks, *extra)
+            row.append(f"{frames / elapsed:>12.0f}/s")
+        print(" ".join(row))
+
+    burst = make_stream(args.burst_frames, seed=2)
+    print(f"\n突发 {args.burst_frames} 帧一次到达:")
+    for name, function, extra in (("旧算法", legacy_parse, ()),
+                                  ("定长模式", parser_parse, (MODE_FIXED,))):
+        frames, elapsed = measure(function, [burst], *extra)
+        print(f"  {name}: {elapsed * 1000:.1f} ms, {frames / elapsed:.0f} 帧/秒")
+
+
+if __name__ == "__main__":
+    main()
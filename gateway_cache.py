@@ -0,0 +1,122 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+
+from xknx.io.self_description import request_description
+
+from knx_discovery import gateway_to_dict
+
+logger = logging.getLogger("GatewayCache")
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"), ".knx_gateways.json")
+# 缓存有效期(秒)
+DEFAULT_TTL = 7 * 24 * 3600
+# 单播描述请求的超时时间(秒)
+REVALIDATE_TIMEOUT = 2.0
+
+
+class GatewayCache:
+    """按本地接口保存已发现网关的磁盘缓存
+
+    文件格式: {本地IP: {"timestamp": 保存时间, "gateways": [网关字典, ...]}}
+    可在任意线程中使用；在事件循环中请用put_async()/put_all_async()，在线程池中读写文件。
+    """
+
+    def __init__(self, filename=DEFAULT_CACHE_FILE, ttl=DEFAULT_TTL):
+        self.filename = filename
+        self.ttl = ttl
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+        try:
+            with open(self.filename, encoding="utf-8") as f:
+                self._entries = json.load(f)
+        except FileNotFoundError:
+            self._entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取网关缓存 {self.filename} 失败: {e}")
+            self._entries = {}
+        return self._entries
+
+    def _save(self):
+        # 先写临时文件再替换，避免写到一半时崩溃损坏缓存
+        tmp_filename = f"{self.filename}.tmp"
+        try:
+            with open(tmp_filename, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_filename, self.filename)
+        except OSError as e:
+            logger.warning(f"保存网关缓存 {self.filename} 失败: {e}")
+
+    def get(self, local_ip):
+        """返回该接口未过期的缓存网关列表"""
+        with self._lock:
+            entry = self._load().get(local_ip)
+        if not entry or time.time() - entry.get("timestamp", 0) > self.ttl:
+            return []
+        return [dict(gateway) for gateway in entry.get("gateways", [])]
+
+    def put(self, local_ip, gateways):
+        """保存该接口的网关列表"""
+        self._put({local_ip: gateways})
+
+    def put_all(self, gateways):
+        """按每个网关的local_ip分组保存"""
+        by_interface = {}
+        for gateway in gateways:
+            by_interface.setdefault(gateway["local_ip"], []).append(gateway)
+        self._put(by_interface)
+
+    async def put_async(self, local_ip, gateways):
+        """在线程池中执行put()，不阻塞事件循环"""
+        await asyncio.get_running_loop().run_in_executor(None, self.put, local_ip, list(gateways))
+
+    async def put_all_async(self, gateways):
+        """在线程池中执行put_all()，不阻塞事件循环"""
+        await asyncio.get_running_loop().run_in_executor(None, self.put_all, list(gateways))
+
+    def _put(self, by_interface):
+        # 所有接口一起更新，只写一次文件
+        with self._lock:
+            entries = self._load()
+            for local_ip, gateways in by_interface.items():
+                entries[local_ip] = {
+                    "timestamp": time.time(),
+                    "gateways": [dict(gateway) for gateway in gateways],
+                }
+            self._save()
+
+
+async def revalidate_gateway(local_ip, gateway, timeout=REVALIDATE_TIMEOUT):
+    """向网关发送单播DESCRIPTION_REQUEST，在线时返回更新后的网关字典，否则返回None"""
+    try:
+        descriptor = await asyncio.wait_for(
+            request_description(gateway["ip"], gateway["port"], local_ip=local_ip),
+            timeout
+        )
+    except Exception as e:
+        logger.debug(f"网关 {gateway['ip']}:{gateway['port']} 验证失败: {e}")
+        return None
+    # 名称和个体地址以最新的描述响应为准，其余字段保留缓存中的值
+    info = dict(gateway)
+    info.update(gateway_to_dict(descriptor))
+    info["local_ip"] = local_ip
+    return info
+
+
+async def revalidate(cache, local_ip, gateways, timeout=REVALIDATE_TIMEOUT):
+    """并行验证缓存中的网关，把仍然在线的写回缓存并返回"""
+    results = await asyncio.gather(
+        *(revalidate_gateway(local_ip, gateway, timeout) for gateway in gateways)
+    )
+    valid = [info for info in results if info is not None]
+    # 全部失败多半是接口暂时不通，保留原缓存等待过期
+    if valid:
+        await cache.put_async(local_ip, valid)
+    return valid
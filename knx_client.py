@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import threading
+
+import netifaces
+from xknx.dpt import DPTBase, DPTBinary
+from xknx.telegram import GroupAddress, Telegram
+from xknx.telegram.apci import GroupValueWrite
+
+from knx_connection import DEFAULT_GATEWAY_PORT, create_connection
+from knx_discovery import (DEFAULT_QUIET_PERIOD, DEFAULT_SCAN_TIMEOUT, GatewayDiscovery,
+                           MultiInterfaceDiscovery)
+
+logger = logging.getLogger("KNXClient")
+
+
+def get_local_ips():
+    """获取所有本地IPv4地址(不含回环地址)"""
+    ips = []
+    try:
+        for interface in netifaces.interfaces():
+            ifaddresses = netifaces.ifaddresses(interface)
+            if netifaces.AF_INET in ifaddresses:
+                for link in ifaddresses[netifaces.AF_INET]:
+                    ip = link['addr']
+                    if ip != "127.0.0.1":  # 排除回环地址
+                        ips.append(ip)
+    except Exception as e:
+        logger.error(f"获取IP地址失败: {e}")
+    return ips
+
+
+def parse_value(text):
+    """把文本值转换为bool/int/float，无法转换时保留字符串"""
+    text = text.strip()
+    lowered = text.lower()
+    if lowered in ("on", "true"):
+        return True
+    if lowered in ("off", "false"):
+        return False
+    for convert in (int, float):
+        try:
+            return convert(text)
+        except ValueError:
+            pass
+    return text
+
+
+def build_telegram(group_address, value, dpt=None):
+    """按DPT编码值并创建GroupValueWrite报文，未指定DPT时按1位二进制值处理"""
+    if not dpt or dpt == "binary":
+        # 不截断小数，也不接受文本，避免把用户的值静默地改成别的值
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        if not isinstance(value, int):
+            raise ValueError(f"未指定DPT时值必须是整数或开关值: {value!r}")
+        payload = DPTBinary(int(value))
+    else:
+        transcoder = DPTBase.parse_transcoder(dpt)
+        if transcoder is None:
+            raise ValueError(f"未知的DPT: {dpt}")
+        payload = transcoder.to_knx(value)
+    return Telegram(
+        destination_address=GroupAddress(group_address),
+        payload=GroupValueWrite(value=payload)
+    )
+
+
+class KNXClient:
+    """无界面的KNX客户端
+
+    扫描、连接、发送和接收都是同一个事件循环上的协程，每个网关只保持一条隧道。
+    在asyncio程序中用`async with KNXClient() as client`直接使用当前事件循环；
+    在Tk等同步程序中调用start()在后台线程运行自己的事件循环，再用submit()提交协程，
+    任意多个调用方共用这个事件循环，不需要为每个操作创建线程。
+    """
+
+    def __init__(self, local_ip=None, rate_limit=0, schema=None):
+        self.local_ip = local_ip
+        self.rate_limit = rate_limit  # 每个网关每秒最多发送的报文数，0表示不限制
+        self.schema = schema  # 组地址表(knx_schema.GroupAddressSchema)，write()未指定DPT时使用
+        self.loop = None
+        self.default_gateway = None  # 最近一次connect()的(本地IP, 网关IP, 端口)
+        self._thread = None
+        self._connections = {}
+        self._start_lock = threading.Lock()
+
+    # ---------- 事件循环 ----------
+
+    def start(self):
+        """在后台线程中启动客户端自己的事件循环(重复调用无影响)"""
+        with self._start_lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            ready = threading.Event()
+            self._thread = threading.Thread(
+                target=self._run_loop,
+                args=(ready,),
+                name="KNXClientLoop",
+                daemon=True
+            )
+            self._thread.start()
+            ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(ready.set)
+        self.loop.run_forever()
+        self.loop.close()
+
+    def submit(self, coro):
+        """线程安全地在客户端的事件循环中执行协程，返回concurrent.futures.Future"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self, timeout=5):
+        """关闭所有连接并停止后台事件循环"""
+        with self._start_lock:
+            if self._thread is None:
+                return
+            try:
+                asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(timeout)
+            except Exception as e:
+                logger.warning(f"关闭连接时出错: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout)
+            self._thread = None
+            self.loop = None
+
+    async def __aenter__(self):
+        self.loop = asyncio.get_running_loop()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+        self.loop = None
+
+    async def close(self):
+        """断开所有网关连接"""
+        connections = list(self._connections.values())
+        self._connections.clear()
+        await asyncio.gather(*(c.close() for c in connections), return_exceptions=True)
+
+    # ---------- 扫描 ----------
+
+    def discovery(self, local_ip=None, all_interfaces=False, expected_count=None,
+                  quiet_period=DEFAULT_QUIET_PERIOD, timeout=DEFAULT_SCAN_TIMEOUT):
+        """创建网关发现对象，可用stream()逐个获取结果并读取progress"""
+        if all_interfaces:
+            return MultiInterfaceDiscovery(get_local_ips(), expected_count, quiet_period, timeout)
+        return GatewayDiscovery(local_ip or self.local_ip, expected_count, quiet_period, timeout)
+
+    async def scan(self, local_ip=None, all_interfaces=False, expected_count=None,
+                   quiet_period=DEFAULT_QUIET_PERIOD, timeout=DEFAULT_SCAN_TIMEOUT, on_found=None):
+        """扫描KNX网关，返回网关字典列表"""
+        discovery = self.discovery(local_ip, all_interfaces, expected_count, quiet_period, timeout)
+        return await discovery.run(on_found)
+
+    # ---------- 连接 ----------
+
+    def _key(self, gateway_ip, gateway_port, local_ip):
+        if gateway_ip is None:
+            if self.default_gateway is None:
+                raise ValueError("未指定KNX路由器")
+            return self.default_gateway
+        return (local_ip or self.local_ip, gateway_ip, gateway_port)
+
+    def get_connection(self, gateway_ip=None, gateway_port=DEFAULT_GATEWAY_PORT, local_ip=None):
+        """获取(或创建)到指定网关的连接，只能在客户端的事件循环中调用"""
+        key = self._key(gateway_ip, gateway_port, local_ip)
+        connection = self._connections.get(key)
+        if connection is None:
+            connection = create_connection(*key, rate_limit=self.rate_limit)
+            self._connections[key] = connection
+        return connection
+
+    async def connect(self, gateway_ip, gateway_port=DEFAULT_GATEWAY_PORT, local_ip=None):
+        """建立到网关的隧道连接(组播地址为路由模式)，并设为之后发送和接收的默认网关"""
+        connection = self.get_connection(gateway_ip, gateway_port, local_ip)
+        await connection.connect()
+        self.default_gateway = connection.key
+        return connection
+
+    def is_connected(self, gateway_ip=None, gateway_port=DEFAULT_GATEWAY_PORT, local_ip=None):
+        connection = self._connections.get(self._key(gateway_ip, gateway_port, local_ip))
+        return connection is not None and connection.connected
+
+    # ---------- 发送 ----------
+
+    async def send_telegram(self, telegram, gateway_ip=None, gateway_port=DEFAULT_GATEWAY_PORT,
+                            local_ip=None):
+        """发送报文并等待网关确认，返回确认耗时(秒)"""
+        connection = self.get_connection(gateway_ip, gateway_port, local_ip)
+        return await connection.send_telegram(telegram)
+
+    def build_telegram(self, group_address, value, dpt=None):
+        """按指定的DPT或组地址表编码值，值或组地址无效时抛出ValueError或xknx的异常"""
+        if self.schema is not None:
+            return self.schema.telegram(group_address, value, dpt)
+        return build_telegram(group_address, value, dpt)
+
+    async def write(self, group_address, value, dpt=None, gateway_ip=None,
+                    gateway_port=DEFAULT_GATEWAY_PORT, local_ip=None):
+        """向组地址写入值，返回确认耗时(秒)"""
+        telegram = self.build_telegram(group_address, value, dpt)
+        return await self.send_telegram(telegram, gateway_ip, gateway_port, local_ip)
+
+    # ---------- 接收 ----------
+
+    def add_telegram_callback(self, callback, gateway_ip=None, gateway_port=DEFAULT_GATEWAY_PORT,
+                              local_ip=None):
+        """注册接收报文的回调，返回注销函数，只能在客户端的事件循环中调用"""
+        connection = self.get_connection(gateway_ip, gateway_port, local_ip)
+        return connection.add_telegram_callback(callback)
+
+    async def telegrams(self, gateway_ip=None, gateway_port=DEFAULT_GATEWAY_PORT, local_ip=None):
+        """异步生成器，逐个产出从网关收到的报文"""
+        received = asyncio.Queue()
+        connection = self.get_connection(gateway_ip, gateway_port, local_ip)
+        remove_callback = connection.add_telegram_callback(received.put_nowait)
+        try:
+            await connection.connect()
+            while True:
+                yield await received.get()
+        finally:
+            remove_callback()
@@ -0,0 +1,199 @@
+import asyncio
+import ipaddress
+import logging
+import time
+
+from xknx import XKNX
+from xknx.exceptions import CommunicationError, ConfirmationError
+from xknx.io import ConnectionConfig, ConnectionType
+
+from knx_metrics import ACK_SECONDS, CONNECT_SECONDS, SEND_ERRORS, TELEGRAMS_SENT
+
+logger = logging.getLogger("KNXConnection")
+
+DEFAULT_GATEWAY_PORT = 3671
+# 命令行工具默认使用的本地IP和KNX路由器IP
+DEFAULT_LOCAL_IP = "192.168.0.24"
+DEFAULT_GATEWAY_IP = "192.168.0.11"
+# KNX TP总线每秒大约能承载20条报文
+DEFAULT_RATE_LIMIT = 20
+# KNXnet/IP路由(组播)地址
+DEFAULT_MULTICAST_GROUP = "224.0.23.12"
+# 断线后自动重连的等待时间(秒)
+AUTO_RECONNECT_WAIT = 3
+
+
+class KNXTunnelConnection:
+    """到单个KNX网关的长连接隧道
+
+    连接在第一次发送时建立并一直保持，断线后由xknx自动重连。
+    每条报文都等待网关返回的L_DATA_CON确认后才算发送成功。
+    """
+
+    def __init__(self, local_ip, gateway_ip, gateway_port=DEFAULT_GATEWAY_PORT, rate_limit=0):
+        self.local_ip = local_ip
+        self.gateway_ip = gateway_ip
+        self.gateway_port = gateway_port
+        self.rate_limit = rate_limit  # 每秒最多发送的报文数，0表示不限制
+        self.xknx = None
+        self.connect_time = None  # 最近一次建立连接耗时(秒)
+        self.metrics_label = f"{gateway_ip}:{gateway_port}"
+        self._connect_lock = asyncio.Lock()
+        self._send_lock = asyncio.Lock()
+        self._last_send_time = 0.0
+        self._telegram_callbacks = []
+
+    @property
+    def key(self):
+        return (self.local_ip, self.gateway_ip, self.gateway_port)
+
+    @property
+    def connected(self):
+        return self.xknx is not None and self.xknx.connection_manager.connected.is_set()
+
+    async def connect(self):
+        """建立隧道连接(已连接时直接返回)"""
+        if self.xknx is not None:
+            return
+        async with self._connect_lock:
+            if self.xknx is not None:
+                return
+            xknx = XKNX(
+                connection_config=self._connection_config(),
+                telegram_received_cb=self._telegram_received,
+            )
+            start_time = time.perf_counter()
+            try:
+                await xknx.start()
+            except BaseException as e:
+                if isinstance(e, Exception):
+                    SEND_ERRORS.inc(gateway=self.metrics_label, error=type(e).__name__)
+                # 清理启动了一半的后台任务(包括连接超时被取消时)
+                try:
+                    await xknx.stop()
+                except Exception:
+                    pass
+                raise
+            self.connect_time = time.perf_counter() - start_time
+            CONNECT_SECONDS.observe(self.connect_time, gateway=self.metrics_label)
+            self.xknx = xknx
+            logger.info(f"已连接到 {self.gateway_ip}:{self.gateway_port} "
+                        f"(耗时 {self.connect_time * 1000:.0f} ms)")
+
+    def _connection_config(self):
+        return ConnectionConfig(
+            local_ip=self.local_ip,
+            gateway_ip=self.gateway_ip,
+            gateway_port=self.gateway_port,
+            auto_reconnect=True,
+            auto_reconnect_wait=AUTO_RECONNECT_WAIT,
+            connection_type=ConnectionType.TUNNELING,
+        )
+
+    def add_telegram_callback(self, callback):
+        """注册报文回调，重连后依然有效，返回注销函数
+
+        与xknx一致，回调既收到总线上的报文，也收到本连接发出并已确认的报文。
+        """
+        self._telegram_callbacks.append(callback)
+
+        def remove():
+            if callback in self._telegram_callbacks:
+                self._telegram_callbacks.remove(callback)
+
+        return remove
+
+    def _telegram_received(self, telegram):
+        for callback in list(self._telegram_callbacks):
+            try:
+                callback(telegram)
+            except Exception:
+                logger.exception("处理接收报文的回调出错")
+
+    async def close(self):
+        """断开隧道连接"""
+        async with self._connect_lock:
+            xknx, self.xknx = self.xknx, None
+            if xknx is not None:
+                try:
+                    await xknx.stop()
+                except Exception as e:
+                    logger.warning(f"断开 {self.gateway_ip}:{self.gateway_port} 时出错: {e}")
+
+    async def _throttle(self):
+        """按照rate_limit限制发送速率"""
+        if not self.rate_limit:
+            return
+        wait = self._last_send_time + 1 / self.rate_limit - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        self._last_send_time = time.monotonic()
+
+    async def send_telegram(self, telegram):
+        """发送报文并等待网关确认，返回从发送到确认的耗时(秒)
+
+        确认超时抛出ConfirmationError；连接失效时会重建连接并重试一次。
+        从调用到确认的总耗时(含排队和限速等待)记入knx_telegram_ack_seconds。
+        """
+        enqueue_time = time.perf_counter()
+        for attempt in (1, 2):
+            await self.connect()
+            try:
+                async with self._send_lock:
+                    await self._throttle()
+                    start_time = time.perf_counter()
+                    # cemi_handler会一直等待L_DATA_CON确认
+                    await self.xknx.cemi_handler.send_telegram(telegram)
+                    end_time = time.perf_counter()
+                latency = end_time - start_time
+                ACK_SECONDS.observe(end_time - enqueue_time, gateway=self.metrics_label)
+                TELEGRAMS_SENT.inc(gateway=self.metrics_label)
+                self._telegram_received(telegram)
+                return latency
+            except ConfirmationError:
+                SEND_ERRORS.inc(gateway=self.metrics_label, error="ConfirmationError")
+                raise
+            except CommunicationError as e:
+                if attempt == 2:
+                    SEND_ERRORS.inc(gateway=self.metrics_label, error=type(e).__name__)
+                    raise
+                logger.warning(f"连接 {self.gateway_ip}:{self.gateway_port} 失效，正在重连: {e}")
+                await self.close()
+
+
+class KNXRoutingConnection(KNXTunnelConnection):
+    """KNXnet/IP路由(组播)发送
+
+    与KNXTunnelConnection接口相同，但不占用网关的隧道连接数：报文作为ROUTING_INDICATION
+    直接发往组播地址，不需要建立连接，也没有网关确认，send_telegram()返回的是等待发送的时间。
+    xknx按规范在每条ROUTING_INDICATION之后暂停20 ms，并在收到ROUTING_BUSY时
+    按其等待时间暂停发送；rate_limit可进一步限制为总线速率。
+    """
+
+    def __init__(self, local_ip, gateway_ip=DEFAULT_MULTICAST_GROUP, gateway_port=DEFAULT_GATEWAY_PORT,
+                 rate_limit=0, individual_address=None):
+        super().__init__(local_ip, gateway_ip, gateway_port, rate_limit)
+        self.individual_address = individual_address  # 作为发送方的物理地址，None时使用xknx的默认值
+
+    def _connection_config(self):
+        return ConnectionConfig(
+            local_ip=self.local_ip,
+            multicast_group=self.gateway_ip,
+            multicast_port=self.gateway_port,
+            individual_address=self.individual_address,
+            connection_type=ConnectionType.ROUTING,
+        )
+
+
+def is_multicast(ip):
+    try:
+        return ipaddress.ip_address(ip).is_multicast
+    except ValueError:
+        return False
+
+
+def create_connection(local_ip, gateway_ip, gateway_port=DEFAULT_GATEWAY_PORT, rate_limit=0):
+    """组播地址使用路由模式，其他地址使用隧道"""
+    if is_multicast(gateway_ip):
+        return KNXRoutingConnection(local_ip, gateway_ip, gateway_port, rate_limit)
+    return KNXTunnelConnection(local_ip, gateway_ip, gateway_port, rate_limit)
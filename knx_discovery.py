@@ -0,0 +1,236 @@
+import asyncio
+import contextlib
+import logging
+import time
+
+from xknx import XKNX
+from xknx.io import GatewayScanner
+
+from knx_metrics import GATEWAYS_FOUND, SCAN_SECONDS
+
+logger = logging.getLogger("KNXDiscovery")
+
+# 没有任何响应时最多等待的时间(秒)
+DEFAULT_SCAN_TIMEOUT = 3.0
+# 收到响应后，超过这段时间没有新响应就结束扫描(秒)
+DEFAULT_QUIET_PERIOD = 0.5
+
+
+def gateway_to_dict(gateway):
+    """把GatewayDescriptor转换为界面使用的字典"""
+    return {
+        "name": gateway.name,
+        "ip": gateway.ip_addr,
+        "port": gateway.port,
+        "individual_address": str(gateway.individual_address) if gateway.individual_address else "",
+        "local_ip": gateway.local_ip,
+    }
+
+
+class GatewayDiscovery:
+    """可提前结束的KNX网关发现
+
+    每收到一个SEARCH_RESPONSE就立即产出，找到expected_count个网关、
+    或最后一次响应后quiet_period秒内没有新响应时结束，最长timeout秒。
+    search_address为(IP, 端口)时把SEARCH_REQUEST发到该地址而不是KNX组播地址(用于模拟网关)。
+    """
+
+    def __init__(self, local_ip, expected_count=None, quiet_period=DEFAULT_QUIET_PERIOD,
+                 timeout=DEFAULT_SCAN_TIMEOUT, search_address=None):
+        self.local_ip = local_ip
+        self.search_address = search_address
+        self.expected_count = expected_count or None
+        self.quiet_period = quiet_period
+        self.timeout = timeout
+        self.found = []
+        self.start_time = None
+        self.end_time = None
+        self._deadline = None
+
+    @property
+    def finished(self):
+        return self.end_time is not None
+
+    @property
+    def duration(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    @property
+    def progress(self):
+        """当前进度(0~1)，取已找到数量和剩余等待时间两者中较大的一个"""
+        if self.finished:
+            return 1.0
+        if self.start_time is None:
+            return 0.0
+        now = time.monotonic()
+        total = self._deadline - self.start_time
+        time_progress = (now - self.start_time) / total if total > 0 else 1.0
+        count_progress = len(self.found) / self.expected_count if self.expected_count else 0.0
+        return min(1.0, max(time_progress, count_progress))
+
+    def _next_wait(self):
+        return self._deadline - time.monotonic()
+
+    async def stream(self):
+        """异步生成器，逐个产出发现的网关字典"""
+        self.found = []
+        self.start_time = time.monotonic()
+        self.end_time = None
+        hard_deadline = self.start_time + self.timeout
+        self._deadline = hard_deadline
+
+        if self.search_address:
+            xknx = XKNX(multicast_group=self.search_address[0], multicast_port=self.search_address[1])
+        else:
+            xknx = XKNX()
+        scanner = GatewayScanner(
+            xknx,
+            local_ip=self.local_ip,
+            timeout_in_seconds=self.timeout,
+            stop_on_found=self.expected_count,
+        )
+        responses = asyncio.Queue()
+
+        async def collect():
+            try:
+                async for gateway in scanner.async_scan():
+                    responses.put_nowait(gateway)
+            finally:
+                responses.put_nowait(None)
+
+        collect_task = asyncio.create_task(collect())
+        seen = set()
+        try:
+            while True:
+                wait = self._next_wait()
+                if wait <= 0:
+                    break
+                try:
+                    gateway = await asyncio.wait_for(responses.get(), wait)
+                except asyncio.TimeoutError:
+                    break
+                if gateway is None:
+                    break
+                info = gateway_to_dict(gateway)
+                key = (info["ip"], info["port"])
+                if key in seen:
+                    continue
+                seen.add(key)
+                self.found.append(info)
+                # 收到响应后只再等待一个静默期
+                self._deadline = min(hard_deadline, time.monotonic() + self.quiet_period)
+                yield info
+                if self.expected_count and len(self.found) >= self.expected_count:
+                    break
+        finally:
+            self.end_time = time.monotonic()
+            collect_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await collect_task
+            SCAN_SECONDS.observe(self.duration, local_ip=self.local_ip)
+            GATEWAYS_FOUND.set(len(self.found), local_ip=self.local_ip)
+            logger.debug(f"{self.local_ip} 上的扫描结束，找到 {len(self.found)} 个网关，"
+                         f"耗时 {self.duration:.2f} s")
+
+    async def run(self, on_found=None):
+        """执行扫描并返回全部结果，on_found在每发现一个网关时调用"""
+        async for info in self.stream():
+            if on_found is not None:
+                on_found(info)
+        return self.found
+
+
+class MultiInterfaceDiscovery:
+    """在所有本地接口上同时扫描KNX网关
+
+    各接口的扫描在同一个事件循环中并行运行，结果按个体地址或IP:端口去重，
+    每个网关记录最先到达它的本地接口(local_ip)以及所有能到达它的接口(interfaces)。
+    """
+
+    def __init__(self, local_ips, expected_count=None, quiet_period=DEFAULT_QUIET_PERIOD,
+                 timeout=DEFAULT_SCAN_TIMEOUT):
+        self.expected_count = expected_count or None
+        # 单个接口不设预期数量，由合并后的结果决定何时结束
+        self.discoveries = [
+            GatewayDiscovery(local_ip, quiet_period=quiet_period, timeout=timeout)
+            for local_ip in local_ips
+        ]
+        self.found = []
+        self.start_time = None
+        self.end_time = None
+
+    @property
+    def finished(self):
+        return self.end_time is not None
+
+    @property
+    def duration(self):
+        if self.start_time is None:
+            return 0.0
+        return (self.end_time or time.monotonic()) - self.start_time
+
+    @property
+    def progress(self):
+        """当前进度(0~1)，以最慢的接口为准"""
+        if self.finished or not self.discoveries:
+            return 1.0
+        time_progress = min(d.progress for d in self.discoveries)
+        count_progress = len(self.found) / self.expected_count if self.expected_count else 0.0
+        return min(1.0, max(time_progress, count_progress))
+
+    def _find_duplicate(self, info):
+        for gateway in self.found:
+            if (gateway["ip"], gateway["port"]) == (info["ip"], info["port"]):
+                return gateway
+            if info["individual_address"] and gateway["individual_address"] == info["individual_address"]:
+                return gateway
+        return None
+
+    async def stream(self):
+        """异步生成器，合并所有接口的结果并逐个产出去重后的网关字典"""
+        self.found = []
+        self.start_time = time.monotonic()
+        self.end_time = None
+        responses = asyncio.Queue()
+
+        async def run_one(discovery):
+            try:
+                async for info in discovery.stream():
+                    responses.put_nowait(info)
+            except Exception as e:
+                logger.warning(f"在 {discovery.local_ip} 上扫描失败: {e}")
+            finally:
+                responses.put_nowait(None)
+
+        tasks = [asyncio.create_task(run_one(d)) for d in self.discoveries]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                info = await responses.get()
+                if info is None:
+                    remaining -= 1
+                    continue
+                duplicate = self._find_duplicate(info)
+                if duplicate is not None:
+                    if info["local_ip"] not in duplicate["interfaces"]:
+                        duplicate["interfaces"].append(info["local_ip"])
+                    continue
+                info["interfaces"] = [info["local_ip"]]
+                self.found.append(info)
+                yield info
+                if self.expected_count and len(self.found) >= self.expected_count:
+                    break
+        finally:
+            self.end_time = time.monotonic()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run(self, on_found=None):
+        """执行扫描并返回全部结果，on_found在每发现一个网关时调用"""
+        async for info in self.stream():
+            if on_found is not None:
+                on_found(info)
+        return self.found
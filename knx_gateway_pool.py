@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import time
+
+from xknx.exceptions import CommunicationError, ConfirmationError
+
+from knx_connection import DEFAULT_GATEWAY_PORT
+
+logger = logging.getLogger("KNXGatewayPool")
+
+# 确认延迟的指数移动平均系数
+LATENCY_EWMA_ALPHA = 0.2
+# 单次发送(含建立连接)的超时时间(秒)
+DEFAULT_SEND_TIMEOUT = 5.0
+# 失败后暂停使用该路由器的时间(秒)，连续失败时加倍，最多MAX_BACKOFF秒
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+# 这些错误说明路由器慢或不可用，换一个路由器重试
+FAILOVER_ERRORS = (ConfirmationError, CommunicationError, OSError, asyncio.TimeoutError)
+
+
+class GatewayHealth:
+    """一个路由器的健康状态和统计"""
+
+    __slots__ = ("ip", "port", "local_ip", "name", "latency", "in_flight", "sent", "failures",
+                 "consecutive_failures", "down_until", "last_error")
+
+    def __init__(self, ip, port, local_ip=None, name=""):
+        self.ip = ip
+        self.port = port
+        self.local_ip = local_ip
+        self.name = name or ip
+        self.latency = None  # 确认延迟的移动平均(秒)，None表示还没有发送过
+        self.in_flight = 0  # 正在等待确认的报文数
+        self.sent = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.down_until = 0.0  # 在此时间(time.monotonic())之前不使用
+        self.last_error = None
+
+    @property
+    def key(self):
+        return (self.ip, self.port, self.local_ip)
+
+    def available(self, now):
+        return now >= self.down_until
+
+    def score(self):
+        """分数越小越优先: 按确认延迟和正在发送的报文数估算排队时间，未发送过的路由器优先试用"""
+        return ((self.latency or 0.0) * (self.in_flight + 1), self.in_flight)
+
+    def record_success(self, latency):
+        self.sent += 1
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_EWMA_ALPHA * (latency - self.latency)
+
+    def record_failure(self, error, now):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error) or type(error).__name__
+        backoff = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (self.consecutive_failures - 1))
+        self.down_until = now + backoff
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "gateway": f"{self.ip}:{self.port}",
+            "sent": self.sent,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "healthy": self.available(time.monotonic()),
+            "last_error": self.last_error,
+        }
+
+
+class GatewayPool:
+    """在多个能到达同一条总线的路由器之间分配报文
+
+    每个路由器使用KNXClient中各自的隧道，发送时选择排队时间最短的可用路由器；
+    确认超时或连接失败时暂停使用该路由器(退避时间逐次加倍)，并换下一个路由器重试。
+    并发发送时报文分散到所有路由器，总吞吐量随路由器数量增加。
+    除update()和stats()外，所有方法都只能在客户端的事件循环中调用。
+    """
+
+    def __init__(self, client, gateways=(), send_timeout=DEFAULT_SEND_TIMEOUT):
+        self.client = client
+        self.send_timeout = send_timeout
+        self.gateways = []
+        for gateway in gateways:
+            self.add(gateway)
+
+    def __len__(self):
+        return len(self.gateways)
+
+    def add(self, gateway):
+        """添加路由器，gateway为扫描结果的字典(ip、port、local_ip、name)"""
+        health = GatewayHealth(gateway["ip"], gateway.get("port", DEFAULT_GATEWAY_PORT),
+                               gateway.get("local_ip"), gateway.get("name", ""))
+        if all(existing.key != health.key for existing in self.gateways):
+            self.gateways.append(health)
+        return health
+
+    def update(self, gateways):
+        """替换路由器列表(如重新扫描后)，仍在列表中的路由器保留其统计"""
+        existing = {gateway.key: gateway for gateway in self.gateways}
+        updated = []
+        for gateway in gateways:
+            key = (gateway["ip"], gateway.get("port", DEFAULT_GATEWAY_PORT), gateway.get("local_ip"))
+            if key in existing:
+                updated.append(existing.pop(key))
+            elif all(health.key != key for health in updated):
+                updated.append(GatewayHealth(*key, gateway.get("name", "")))
+        # 整体替换列表，正在事件循环中发送的报文不受影响
+        self.gateways = updated
+
+    def _candidates(self):
+        """按优先级排列的路由器: 可用的按分数排序，暂停中的按恢复时间排在后面"""
+        now = time.monotonic()
+        available = sorted((g for g in self.gateways if g.available(now)), key=GatewayHealth.score)
+        down = sorted((g for g in self.gateways if not g.available(now)), key=lambda g: g.down_until)
+        return available + down
+
+    async def connect(self):
+        """预先连接所有路由器，返回连接失败的{路由器名称: 错误}"""
+        errors = {}
+
+        async def connect_one(gateway):
+            try:
+                await asyncio.wait_for(self.client.connect(gateway.ip, gateway.port, gateway.local_ip),
+                                       self.send_timeout)
+            except FAILOVER_ERRORS as e:
+                gateway.record_failure(e, time.monotonic())
+                errors[gateway.name] = gateway.last_error
+
+        await asyncio.gather(*(connect_one(gateway) for gateway in self.gateways))
+        return errors
+
+    async def send_telegram(self, telegram):
+        """发送报文，失败时依次换其他路由器，返回(确认耗时(秒), GatewayHealth)
+
+        所有路由器都失败时抛出最后一个错误。
+        """
+        if not self.gateways:
+            raise ValueError("路由器池为空")
+        error = None
+        for gateway in self._candidates():
+            gateway.in_flight += 1
+            try:
+                latency = await asyncio.wait_for(
+                    self.client.send_telegram(telegram, gateway.ip, gateway.port, gateway.local_ip),
+                    self.send_timeout
+                )
+            except FAILOVER_ERRORS as e:
+                error = e
+                gateway.record_failure(e, time.monotonic())
+                logger.warning(f"路由器 {gateway.name} ({gateway.ip}:{gateway.port}) 发送失败，"
+                               f"暂停使用至少 {gateway.down_until - time.monotonic():.0f} s: {gateway.last_error}")
+                continue
+            finally:
+                gateway.in_flight -= 1
+            gateway.record_success(latency)
+            return latency, gateway
+        raise error
+
+    def stats(self):
+        return [gateway.stats() for gateway in self.gateways]
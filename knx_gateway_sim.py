@@ -0,0 +1,231 @@
+import argparse
+import asyncio
+import logging
+import random
+
+from xknx.knxip import (HPAI, ConnectRequest, ConnectResponse, ConnectionStateRequest,
+                        ConnectionStateResponse, DescriptionRequest, DescriptionResponse,
+                        DisconnectRequest, DisconnectResponse, KNXIPFrame, SearchRequest,
+                        SearchResponse, TunnellingAck, TunnellingRequest)
+from xknx.knxip.connect_response import ConnectResponseData
+from xknx.knxip.dib import DIBDeviceInformation, DIBSuppSVCFamilies
+from xknx.knxip.error_code import ErrorCode
+from xknx.knxip.knxip_enum import DIBServiceFamily
+from xknx.telegram import IndividualAddress
+
+logger = logging.getLogger("KNXGatewaySim")
+
+DEFAULT_SIM_HOST = "127.0.0.1"
+DEFAULT_SIM_PORT = 3671
+# cEMI消息码
+L_DATA_REQ = 0x11
+L_DATA_CON = 0x2E
+
+
+class _Channel:
+    """一条隧道连接"""
+
+    __slots__ = ("channel_id", "control_addr", "data_addr", "individual_address",
+                 "expected_sequence", "send_sequence")
+
+    def __init__(self, channel_id, control_addr, data_addr, individual_address):
+        self.channel_id = channel_id
+        self.control_addr = control_addr
+        self.data_addr = data_addr
+        self.individual_address = individual_address
+        self.expected_sequence = 0  # 下一个应收到的TUNNELLING_REQUEST序号
+        self.send_sequence = 0  # 发给客户端的TUNNELLING_REQUEST序号
+
+
+class FakeKNXGateway(asyncio.DatagramProtocol):
+    """本地UDP KNXnet/IP网关模拟器，用于没有硬件时的测试和性能测量
+
+    响应SEARCH、DESCRIPTION、CONNECT、CONNECTIONSTATE、DISCONNECT和TUNNELLING请求：
+    每个L_DATA_REQ先回复TUNNELLING_ACK，再经confirm_delay秒(模拟总线发送)回复L_DATA_CON。
+    latency为每个回复的额外延迟(秒)，loss为丢弃收到的请求的概率。
+    """
+
+    def __init__(self, host=DEFAULT_SIM_HOST, port=DEFAULT_SIM_PORT, latency=0.0, loss=0.0,
+                 confirm_delay=0.0, name="KNX Gateway Simulator", individual_address="1.1.250",
+                 max_channels=4, seed=None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.loss = loss
+        self.confirm_delay = confirm_delay
+        self.name = name
+        self.individual_address = IndividualAddress(individual_address)
+        self.max_channels = max_channels
+        self.telegrams_received = 0
+        self.requests_dropped = 0
+        self._random = random.Random(seed)
+        self._channels = {}
+        self._next_channel_id = 1
+        self._transport = None
+
+    # ---------- 启动和停止 ----------
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(lambda: self,
+                                                                 local_addr=(self.host, self.port))
+        # 端口为0时使用系统分配的端口
+        self.port = self._transport.get_extra_info("sockname")[1]
+        logger.info(f"模拟网关正在监听 {self.host}:{self.port}")
+        return self
+
+    def stop(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        self.stop()
+
+    # ---------- 收发 ----------
+
+    def datagram_received(self, data, addr):
+        try:
+            frame, _ = KNXIPFrame.from_knx(data)
+        except Exception as e:
+            logger.warning(f"无法解析来自 {addr} 的数据: {e}")
+            return
+        if self.loss and self._random.random() < self.loss:
+            self.requests_dropped += 1
+            return
+        body = frame.body
+        handler = {
+            SearchRequest: self._on_search,
+            DescriptionRequest: self._on_description,
+            ConnectRequest: self._on_connect,
+            ConnectionStateRequest: self._on_connection_state,
+            DisconnectRequest: self._on_disconnect,
+            TunnellingRequest: self._on_tunnelling_request,
+        }.get(type(body))
+        if handler is not None:
+            handler(body, addr)
+
+    def _send(self, body, addr, delay=0.0):
+        delay += self.latency
+        data = KNXIPFrame.init_from_body(body).to_knx()
+        if delay > 0:
+            asyncio.get_running_loop().call_later(delay, self._sendto, data, addr)
+        else:
+            self._sendto(data, addr)
+
+    def _sendto(self, data, addr):
+        if self._transport is not None:
+            self._transport.sendto(data, addr)
+
+    @staticmethod
+    def _reply_addr(hpai, addr):
+        # HPAI为0.0.0.0:0时(NAT模式)回复到数据包的源地址
+        return addr if hpai.route_back else hpai.addr_tuple
+
+    # ---------- 请求处理 ----------
+
+    def _dibs(self):
+        device = DIBDeviceInformation()
+        device.name = self.name
+        device.individual_address = self.individual_address
+        device.serial_number = "00fa00000001"
+        device.mac_address = "00:00:00:00:00:01"
+        families = DIBSuppSVCFamilies()
+        families.families = [
+            DIBSuppSVCFamilies.Family(DIBServiceFamily.CORE, 1),
+            DIBSuppSVCFamilies.Family(DIBServiceFamily.DEVICE_MANAGEMENT, 1),
+            DIBSuppSVCFamilies.Family(DIBServiceFamily.TUNNELING, 1),
+        ]
+        return [device, families]
+
+    def _on_search(self, body, addr):
+        response = SearchResponse(control_endpoint=HPAI(self.host, self.port))
+        response.dibs = self._dibs()
+        self._send(response, self._reply_addr(body.discovery_endpoint, addr))
+
+    def _on_description(self, body, addr):
+        response = DescriptionResponse()
+        response.dibs = self._dibs()
+        self._send(response, self._reply_addr(body.control_endpoint, addr))
+
+    def _on_connect(self, body, addr):
+        control_addr = self._reply_addr(body.control_endpoint, addr)
+        if len(self._channels) >= self.max_channels:
+            self._send(ConnectResponse(status_code=ErrorCode.E_NO_MORE_CONNECTIONS), control_addr)
+            return
+        channel_id = self._next_channel_id
+        self._next_channel_id = self._next_channel_id % 255 + 1
+        individual_address = IndividualAddress(self.individual_address.raw + channel_id)
+        self._channels[channel_id] = _Channel(channel_id, control_addr,
+                                              self._reply_addr(body.data_endpoint, addr),
+                                              individual_address)
+        self._send(ConnectResponse(
+            communication_channel=channel_id,
+            data_endpoint=HPAI(self.host, self.port),
+            crd=ConnectResponseData(individual_address=individual_address),
+        ), control_addr)
+
+    def _on_connection_state(self, body, addr):
+        status = ErrorCode.E_NO_ERROR if body.communication_channel_id in self._channels \
+            else ErrorCode.E_CONNECTION_ID
+        self._send(ConnectionStateResponse(body.communication_channel_id, status),
+                   self._reply_addr(body.control_endpoint, addr))
+
+    def _on_disconnect(self, body, addr):
+        self._channels.pop(body.communication_channel_id, None)
+        self._send(DisconnectResponse(body.communication_channel_id),
+                   self._reply_addr(body.control_endpoint, addr))
+
+    def _on_tunnelling_request(self, body, addr):
+        channel = self._channels.get(body.communication_channel_id)
+        if channel is None:
+            return
+        sequence = body.sequence_counter
+        if sequence == (channel.expected_sequence - 1) % 256:
+            # 客户端没收到上次的ACK而重发，只回复ACK
+            self._send(TunnellingAck(channel.channel_id, sequence), channel.data_addr)
+            return
+        if sequence != channel.expected_sequence:
+            return
+        channel.expected_sequence = (sequence + 1) % 256
+        self._send(TunnellingAck(channel.channel_id, sequence), channel.data_addr)
+        raw_cemi = body.raw_cemi
+        if not raw_cemi or raw_cemi[0] != L_DATA_REQ:
+            return
+        self.telegrams_received += 1
+        confirmation = TunnellingRequest(channel.channel_id, channel.send_sequence,
+                                         bytes((L_DATA_CON,)) + raw_cemi[1:])
+        channel.send_sequence = (channel.send_sequence + 1) % 256
+        self._send(confirmation, channel.data_addr, self.confirm_delay)
+
+
+async def run_simulator(args):
+    gateway = FakeKNXGateway(args.host, args.port, latency=args.latency / 1000, loss=args.loss,
+                             confirm_delay=args.confirm_delay / 1000)
+    async with gateway:
+        print(f"模拟网关 {args.host}:{args.port} 已启动，按Ctrl+C结束")
+        await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地KNXnet/IP网关模拟器")
+    parser.add_argument("--host", default=DEFAULT_SIM_HOST, help="监听地址")
+    parser.add_argument("--port", type=int, default=DEFAULT_SIM_PORT, help="监听端口")
+    parser.add_argument("--latency", type=float, default=0.0, help="每个回复的额外延迟(毫秒)")
+    parser.add_argument("--loss", type=float, default=0.0, help="丢弃请求的概率(0~1)")
+    parser.add_argument("--confirm-delay", type=float, default=0.0,
+                        help="ACK之后多久发送L_DATA_CON(毫秒)，模拟总线发送时间")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_simulator(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+import argparse
+import asyncio
+import collections
+import json
+import logging
+import time
+import urllib.parse
+
+from xknx.exceptions import ConversionError, CouldNotParseAddress, XKNXException
+
+from knx_client import KNXClient
+from knx_connection import DEFAULT_GATEWAY_IP, DEFAULT_GATEWAY_PORT, DEFAULT_LOCAL_IP, DEFAULT_RATE_LIMIT
+from knx_metrics import REGISTRY, percentile
+from knx_schema import GroupAddressSchema, parse_dpt
+from knx_state_cache import GroupStateCache
+
+logger = logging.getLogger("KNXHttpGateway")
+
+DEFAULT_LISTEN_HOST = "127.0.0.1"
+DEFAULT_HTTP_PORT = 8671
+# 同一组地址在这段时间内的多次写入只发送最后一次(秒)
+DEFAULT_COALESCE_WINDOW = 0.05
+# /stats统计最近多少个请求的延迟
+LATENCY_SAMPLES = 1000
+# 请求体最大字节数，超过时返回413并关闭连接
+MAX_BODY_SIZE = 1024 * 1024
+# 请求中的值或组地址无效时的异常，返回400
+INVALID_WRITE_ERRORS = (ValueError, TypeError, ConversionError, CouldNotParseAddress)
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway",
+                504: "Gateway Timeout"}
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _PendingWrite:
+    """等待发送的一次组地址写入"""
+
+    __slots__ = ("telegram", "futures")
+
+    def __init__(self, telegram):
+        self.telegram = telegram
+        self.futures = []
+
+
+class WriteCoalescer:
+    """合并对同一组地址的重复写入，再通过持久隧道按顺序发送
+
+    写入请求先等待window秒，在真正发送之前对同一组地址的新写入只替换报文，
+    所有请求都在这一条报文确认后一起返回。只接受已编码的报文，无效的值在提交前就被拒绝，
+    不会替换掉有效的写入。
+    """
+
+    def __init__(self, client, window=DEFAULT_COALESCE_WINDOW):
+        self.client = client
+        self.window = window
+        self._pending = {}
+        self._ready = asyncio.Queue()
+        self._sender_task = None
+        self._in_flight = None  # 正在发送的写入
+        self.requests = 0
+        self.coalesced = 0
+        self.telegrams_sent = 0
+        self.errors = 0
+
+    @property
+    def queue_depth(self):
+        """尚未发送的组地址数量"""
+        return len(self._pending)
+
+    def start(self):
+        self._sender_task = asyncio.create_task(self._sender())
+
+    async def stop(self):
+        if self._sender_task is not None:
+            self._sender_task.cancel()
+            await asyncio.gather(self._sender_task, return_exceptions=True)
+            self._sender_task = None
+        # 尚未发送(或发送被取消)的写入不会再发送，让等待它们的请求立即返回错误
+        unfinished = list(self._pending.values())
+        if self._in_flight is not None:
+            unfinished.append(self._in_flight)
+            self._in_flight = None
+        for pending in unfinished:
+            for future in pending.futures:
+                if not future.done():
+                    future.set_exception(ConnectionError("网关正在停止"))
+        self._pending.clear()
+
+    def write(self, telegram):
+        """提交一条GroupValueWrite报文，返回在报文确认后得到确认耗时(秒)的Future"""
+        self.requests += 1
+        future = asyncio.get_running_loop().create_future()
+        group_address = telegram.destination_address
+        pending = self._pending.get(group_address)
+        if pending is not None:
+            # 尚未发送，直接替换为最新的报文
+            self.coalesced += 1
+            pending.telegram = telegram
+        else:
+            pending = _PendingWrite(telegram)
+            self._pending[group_address] = pending
+            asyncio.get_running_loop().call_later(self.window, self._ready.put_nowait, group_address)
+        pending.futures.append(future)
+        return future
+
+    async def _sender(self):
+        while True:
+            group_address = await self._ready.get()
+            pending = self._in_flight = self._pending.pop(group_address)
+            try:
+                latency = await self.client.send_telegram(pending.telegram)
+                self.telegrams_sent += 1
+            except Exception as e:
+                self.errors += 1
+                for future in pending.futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future in pending.futures:
+                if not future.done():
+                    future.set_result(latency)
+
+
+class MetricsText(str):
+    """以纯文本而不是JSON返回的响应"""
+
+
+class KNXHttpGateway:
+    """本地HTTP/JSON命令网关
+
+    POST /write  {"group_address": "0/2/7", "value": 1, "dpt": "1.001"}，也可以是这样的对象组成的列表
+    GET  /state?group_address=0/2/7[&dpt=9.001][&max_age=秒]  返回组地址的当前值，
+         优先使用总线上收到的值(GroupStateCache)，未命中或过期时才发送GroupValueRead；
+         未指定dpt时使用组地址表中的DPT，都没有时只返回原始值
+    GET  /stats  返回请求数、合并数、队列深度、请求延迟和状态缓存命中数
+    GET  /metrics  Prometheus文本格式的连接、确认延迟、扫描和错误指标
+    """
+
+    def __init__(self, client, window=DEFAULT_COALESCE_WINDOW):
+        self.client = client
+        self.coalescer = WriteCoalescer(client, window)
+        self.state_cache = GroupStateCache(client)
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+        self._server = None
+
+    async def start(self, host=DEFAULT_LISTEN_HOST, port=DEFAULT_HTTP_PORT, unix_path=None):
+        """开始监听，需要先用client.connect()连接默认网关"""
+        self.coalescer.start()
+        self.state_cache.attach()
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=unix_path)
+            logger.info(f"正在监听 {unix_path}")
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, host, port)
+            logger.info(f"正在监听 http://{host}:{port}")
+        return self._server
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        self.state_cache.detach()
+        await self.coalescer.stop()
+
+    def stats(self):
+        ms = sorted(latency * 1000 for latency in self.latencies)
+        return {
+            "requests": self.coalescer.requests,
+            "coalesced": self.coalescer.coalesced,
+            "telegrams_sent": self.coalescer.telegrams_sent,
+            "errors": self.coalescer.errors,
+            "queue_depth": self.coalescer.queue_depth,
+            "latency_ms": {
+                "p50": round(percentile(ms, 0.5), 2),
+                "p99": round(percentile(ms, 0.99), 2),
+                "max": round(ms[-1], 2) if ms else 0.0,
+            },
+            "state_cache": {
+                "entries": len(self.state_cache),
+                "hits": self.state_cache.hits,
+                "misses": self.state_cache.misses,
+                "bus_reads": self.state_cache.bus_reads,
+            },
+        }
+
+    async def _write(self, item, telegram):
+        start_time = time.perf_counter()
+        queue_depth = self.coalescer.queue_depth
+        ack_latency = await self.coalescer.write(telegram)
+        latency = time.perf_counter() - start_time
+        self.latencies.append(latency)
+        return {
+            "group_address": item["group_address"],
+            "ok": True,
+            "latency_ms": round(latency * 1000, 2),
+            "ack_ms": round(ack_latency * 1000, 2),
+            "queue_depth": queue_depth,
+        }
+
+    async def _handle_write(self, body):
+        try:
+            request = json.loads(body or b"null")
+            items = request if isinstance(request, list) else [request]
+            telegrams = []
+            for item in items:
+                if not isinstance(item, dict) or "group_address" not in item or "value" not in item:
+                    raise ValueError("每个写入都需要group_address和value")
+                # 提交前先编码，无效的值不会进入合并队列
+                try:
+                    telegrams.append(self.client.build_telegram(item["group_address"], item["value"],
+                                                                item.get("dpt")))
+                except INVALID_WRITE_ERRORS as e:
+                    raise ValueError(f"{item['group_address']}: {e}") from None
+        except ValueError as e:
+            return 400, {"ok": False, "error": str(e)}
+
+        results = await asyncio.gather(*(self._write(item, telegram) for item, telegram in zip(items, telegrams)),
+                                       return_exceptions=True)
+        response = []
+        status = 200
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                status = 502
+                response.append({"group_address": item["group_address"], "ok": False, "error": str(result)})
+            else:
+                response.append(result)
+        return status, response if isinstance(request, list) else response[0]
+
+    async def _handle_state(self, query):
+        params = urllib.parse.parse_qs(query)
+        group_address = params.get("group_address", [""])[0]
+        if not group_address:
+            return 400, {"ok": False, "error": "需要group_address参数"}
+        try:
+            max_age = float(params["max_age"][0]) if "max_age" in params else None
+            dpt = params.get("dpt", [""])[0]
+            if dpt:
+                transcoder = parse_dpt(dpt)
+                if transcoder is None:
+                    raise ValueError(f"未知的DPT: {dpt}")
+            else:
+                entry = self.client.schema.get(group_address) if self.client.schema is not None else None
+                transcoder = entry.transcoder if entry is not None else None
+            hits = self.state_cache.hits
+            payload = await self.state_cache.get(group_address, max_age)
+            value = transcoder.from_knx(payload) if transcoder is not None else None
+        except INVALID_WRITE_ERRORS as e:
+            return 400, {"ok": False, "error": str(e)}
+        except TimeoutError as e:
+            return 504, {"ok": False, "error": str(e)}
+        except (XKNXException, OSError) as e:
+            # GroupValueRead发送失败
+            return 502, {"ok": False, "error": str(e)}
+        return 200, {
+            "group_address": group_address,
+            "ok": True,
+            "value": value,
+            "raw": payload.value,
+            "cached": self.state_cache.hits > hits,
+        }
+
+    async def _route(self, method, path, body, query=""):
+        if path == "/write":
+            if method != "POST":
+                return 405, {"ok": False, "error": "请使用POST"}
+            return await self._handle_write(body)
+        if path == "/state":
+            return await self._handle_state(query)
+        if path == "/stats":
+            return 200, self.stats()
+        if path == "/metrics":
+            return 200, MetricsText(REGISTRY.render())
+        return 404, {"ok": False, "error": f"未知路径: {path}"}
+
+    async def _handle_connection(self, reader, writer):
+        """处理一个HTTP/1.1连接，支持keep-alive"""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._send_response(writer, 400, {"ok": False, "error": "无效的请求"}, False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = headers.get("content-length", "0") or "0"
+                if not length.isdigit():
+                    await self._send_response(writer, 400, {"ok": False, "error": "无效的Content-Length"}, False)
+                    break
+                length = int(length)
+                if length > MAX_BODY_SIZE:
+                    await self._send_response(
+                        writer, 413, {"ok": False, "error": f"请求体超过 {MAX_BODY_SIZE} 字节"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                try:
+                    path, _, query = path.partition("?")
+                    status, payload = await self._route(method, path, body, query)
+                except Exception as e:
+                    logger.exception("处理请求出错")
+                    status, payload = 500, {"ok": False, "error": str(e)}
+                await self._send_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _send_response(writer, status, payload, keep_alive):
+        if isinstance(payload, MetricsText):
+            body = payload.encode("utf-8")
+            content_type = PROMETHEUS_CONTENT_TYPE
+        else:
+            # 解码后的值可能是枚举、日期等，按字符串输出
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = (
+            f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(args):
+    schema = GroupAddressSchema.load(args.schema) if args.schema else None
+    async with KNXClient(local_ip=args.local_ip, rate_limit=args.rate, schema=schema) as client:
+        # 启动时就建立隧道，第一个请求无需等待握手
+        await client.connect(args.gateway, args.port)
+        gateway = KNXHttpGateway(client, window=args.window / 1000)
+        server = await gateway.start(args.listen, args.http_port, args.unix)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await gateway.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地HTTP/JSON KNX命令网关")
+    parser.add_argument("--local-ip", default=DEFAULT_LOCAL_IP, help="本地IP")
+    parser.add_argument("--gateway", default=DEFAULT_GATEWAY_IP, help="KNX路由器IP")
+    parser.add_argument("--port", type=int, default=DEFAULT_GATEWAY_PORT, help="KNX路由器端口")
+    parser.add_argument("--rate", type=int, default=DEFAULT_RATE_LIMIT,
+                        help="每秒最多发送的报文数(0表示不限制)")
+    parser.add_argument("--listen", default=DEFAULT_LISTEN_HOST, help="HTTP监听地址")
+    parser.add_argument("--http-port", type=int, default=DEFAULT_HTTP_PORT, help="HTTP监听端口")
+    parser.add_argument("--unix", help="改为监听Unix套接字路径")
+    parser.add_argument("--window", type=float, default=DEFAULT_COALESCE_WINDOW * 1000,
+                        help="合并同一组地址写入的时间窗口(毫秒)")
+    parser.add_argument("--schema", help="组地址表，请求中未指定dpt时使用")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,187 @@
+import argparse
 import asyncio
-from xknx import XKNX
-from xknx.io import ConnectionConfig, ConnectionType
-from xknx.dpt import DPTBinary
-from xknx.telegram import GroupAddress, Telegram
-from xknx.telegram.apci import GroupValueWrite
-
-
-async def send_knx_command():
-    # 配置连接参数 (匹配您的抓包信息)
-    connection_config = ConnectionConfig(
-        local_ip="192.168.0.24",
-        gateway_ip="192.168.0.11",  # KNX路由器IP
-        gateway_port=3671,  # KNX端口
-    )
-
-    # 创建XKNX实例
-    async with XKNX(connection_config=connection_config) as xknx:
-        # 创建目标组地址
-        group_address = GroupAddress("5/1/1")
-
-        # 创建有效载荷 (关灯命令$00)
-        payload = GroupValueWrite(value=DPTBinary(1))
-
-        # 创建并发送Telegram
-        telegram = Telegram(
-            destination_address=group_address,
-            payload=payload
-        )
-        await xknx.telegrams.put(telegram)
-        print("✅ 命令已成功发送到KNX总线")
-
-
-# 运行异步函数
-asyncio.run(send_knx_command())
\ No newline at end of file
+import csv
+import time
+from knx_client import KNXClient, build_telegram, parse_value
+from knx_connection import (DEFAULT_GATEWAY_IP, DEFAULT_GATEWAY_PORT, DEFAULT_LOCAL_IP, DEFAULT_MULTICAST_GROUP,
+                             DEFAULT_RATE_LIMIT)
+from knx_gateway_pool import GatewayPool
+from knx_metrics import percentile
+from knx_schema import GroupAddressSchema
+
+LOCAL_IP = DEFAULT_LOCAL_IP
+GATEWAY_IP = DEFAULT_GATEWAY_IP  # KNX路由器IP
+GATEWAY_PORT = DEFAULT_GATEWAY_PORT  # KNX端口
+# 不使用--batch时默认发送的命令: 向5/1/1写入1
+DEFAULT_GROUP_ADDRESS = "5/1/1"
+DEFAULT_VALUE = "1"
+
+
+def load_batch_file(filename, value_override=None):
+    """读取批量命令文件，每行: 组地址,DPT,值
+
+    空行和#开头的行会被忽略。指定value_override时(场景模式)每行只需组地址和DPT，
+    所有组地址都写入同一个值。
+    """
+    commands = []
+    with open(filename, newline="", encoding="utf-8") as f:
+        for line_number, row in enumerate(csv.reader(f), start=1):
+            row = [field.strip() for field in row]
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            if line_number == 1 and row[0].lower() in ("group_address", "组地址"):
+                continue  # 标题行
+            group_address = row[0]
+            dpt = row[1] if len(row) > 1 else ""
+            if value_override is not None:
+                value = value_override
+            elif len(row) > 2:
+                value = parse_value(row[2])
+            else:
+                raise ValueError(f"{filename} 第{line_number}行缺少值")
+            commands.append((group_address, dpt, value))
+    return commands
+
+
+class BatchReport:
+    """批量发送的统计结果"""
+
+    def __init__(self, total, duration, latencies, failures):
+        self.total = total
+        self.duration = duration
+        self.latencies = sorted(latencies)
+        self.failures = failures  # [(组地址, 错误信息)]
+
+    @property
+    def sent(self):
+        return len(self.latencies)
+
+    @property
+    def throughput(self):
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+    def summary(self):
+        ms = [latency * 1000 for latency in self.latencies]
+        lines = [
+            f"发送 {self.sent}/{self.total} 条报文，失败 {len(self.failures)} 条，"
+            f"耗时 {self.duration:.2f} s，吞吐量 {self.throughput:.1f} 条/s",
+        ]
+        if ms:
+            lines.append(
+                f"确认延迟: 平均 {sum(ms) / len(ms):.1f} ms, p50 {percentile(ms, 0.5):.1f} ms, "
+                f"p95 {percentile(ms, 0.95):.1f} ms, p99 {percentile(ms, 0.99):.1f} ms, "
+                f"最大 {ms[-1]:.1f} ms"
+            )
+        for group_address, error in self.failures[:10]:
+            lines.append(f"  ❌ {group_address}: {error}")
+        return "\n".join(lines)
+
+
+async def send_batch(commands, local_ip=LOCAL_IP, gateway_ip=GATEWAY_IP,
+                     gateway_port=GATEWAY_PORT, rate_limit=DEFAULT_RATE_LIMIT, schema=None):
+    """通过一条隧道连接批量发送(组地址, DPT, 值)命令，返回BatchReport
+
+    所有报文先编码好，再按总线速率连续发送；等待确认的时间与限速间隔重叠，
+    不会额外拖慢发送。DPT为空的命令使用组地址表schema中的DPT。
+    """
+    telegrams, failures = encode_commands(commands, schema)
+    latencies = []
+    start_time = time.perf_counter()
+    async with KNXClient(local_ip=local_ip, rate_limit=rate_limit) as client:
+        await client.connect(gateway_ip, gateway_port)
+        for group_address, telegram in telegrams:
+            try:
+                latencies.append(await client.send_telegram(telegram))
+            except Exception as e:
+                failures.append((group_address, str(e)))
+    duration = time.perf_counter() - start_time
+    return BatchReport(len(commands), duration, latencies, failures)
+
+
+async def send_batch_pool(commands, local_ip=LOCAL_IP, gateways=(), rate_limit=DEFAULT_RATE_LIMIT,
+                          schema=None):
+    """通过多个路由器并行批量发送，返回(BatchReport, 各路由器的统计)
+
+    gateways为扫描结果格式的字典列表。每个路由器一条隧道并各自限速，
+    报文按确认延迟分配到最空闲的路由器，某个路由器超时后自动改用其他路由器。
+    """
+    telegrams, failures = encode_commands(commands, schema)
+    latencies = []
+    pending = iter(telegrams)
+    start_time = time.perf_counter()
+    async with KNXClient(local_ip=local_ip, rate_limit=rate_limit) as client:
+        pool = GatewayPool(client, gateways)
+        for name, error in (await pool.connect()).items():
+            print(f"⚠️ 无法连接到 {name}: {error}")
+
+        async def worker():
+            # 所有worker共用一个迭代器，事件循环是单线程的，不需要加锁
+            for group_address, telegram in pending:
+                try:
+                    latency, _ = await pool.send_telegram(telegram)
+                    latencies.append(latency)
+                except Exception as e:
+                    failures.append((group_address, str(e)))
+
+        # 每个路由器同时只有一条报文在等待确认，worker数与路由器数相同即可
+        await asyncio.gather(*(worker() for _ in range(len(pool))))
+    duration = time.perf_counter() - start_time
+    return BatchReport(len(commands), duration, latencies, failures), pool.stats()
+
+
+def encode_commands(commands, schema=None):
+    """把(组地址, DPT, 值)命令编码为[(组地址, 报文)]，返回(报文列表, 编码失败列表)"""
+    encode = schema.telegram if schema is not None else build_telegram
+    telegrams = []
+    failures = []
+    for group_address, dpt, value in commands:
+        try:
+            telegrams.append((group_address, encode(group_address, value, dpt)))
+        except Exception as e:
+            failures.append((group_address, f"编码失败: {e}"))
+    return telegrams, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向KNX总线发送命令")
+    parser.add_argument("--group-address", default=DEFAULT_GROUP_ADDRESS, help="单条命令的组地址")
+    parser.add_argument("--value", default=DEFAULT_VALUE, help="单条命令的值")
+    parser.add_argument("--dpt", default="", help="单条命令的DPT(如1.001、5.001、9.001)")
+    parser.add_argument("--batch", help="批量命令文件(CSV: 组地址,DPT,值)")
+    parser.add_argument("--scene-value", help="场景模式: 批量文件中所有组地址写入同一个值")
+    parser.add_argument("--local-ip", default=LOCAL_IP, help="本地IP")
+    parser.add_argument("--gateway", default=GATEWAY_IP,
+                        help="KNX路由器IP，多个IP用逗号分隔时在它们之间负载均衡并自动切换")
+    parser.add_argument("--port", type=int, default=GATEWAY_PORT, help="KNX路由器端口")
+    parser.add_argument("--routing", action="store_true",
+                        help=f"路由模式: 组播到{DEFAULT_MULTICAST_GROUP}，不建立隧道(--gateway为组播地址时也会使用)")
+    parser.add_argument("--rate", type=int, default=DEFAULT_RATE_LIMIT,
+                        help="每秒最多发送的报文数(0表示不限制)")
+    parser.add_argument("--schema", help="组地址表(CSV: 组地址,DPT[,名称]，或ETS导出的CSV/XML)")
+    args = parser.parse_args()
+
+    if args.batch:
+        value_override = parse_value(args.scene_value) if args.scene_value is not None else None
+        commands = load_batch_file(args.batch, value_override)
+    elif args.scene_value is not None:
+        parser.error("--scene-value需要与--batch一起使用")
+    else:
+        # 单条命令与批量命令使用同样的连接、组地址表和路由器参数
+        commands = [(args.group_address, args.dpt, parse_value(args.value))]
+    schema = GroupAddressSchema.load(args.schema) if args.schema else None
+    gateway_ips = [DEFAULT_MULTICAST_GROUP] if args.routing else args.gateway.split(",")
+    if len(gateway_ips) == 1:
+        report = asyncio.run(send_batch(commands, args.local_ip, gateway_ips[0], args.port, args.rate, schema))
+        print(report.summary())
+        return
+
+    gateways = [{"ip": ip.strip(), "port": args.port} for ip in gateway_ips]
+    report, gateway_stats = asyncio.run(send_batch_pool(commands, args.local_ip, gateways, args.rate, schema))
+    print(report.summary())
+    for stats in gateway_stats:
+        print(f"  {stats['gateway']}: 成功 {stats['sent']} 条, 失败 {stats['failures']} 次, "
+              f"平均确认延迟 {stats['latency_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
@@ -0,0 +1,88 @@
+import collections
+import logging
+import logging.handlers
+import threading
+import time
+import tkinter as tk
+
+DEFAULT_LOG_FILE = "knx_controller.log"
+# 日志区域最多保留的行数
+DEFAULT_MAX_LINES = 1000
+# 合并刷新日志区域的间隔(毫秒)，约一帧
+FLUSH_INTERVAL = 33
+# 日志文件达到此大小后轮转，保留LOG_BACKUP_COUNT个旧文件
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 3
+
+
+class LogSink:
+    """线程安全的日志区域
+
+    write()可在任意线程调用，只把消息放入待显示列表；界面线程每帧取出所有待显示的消息，
+    用一次插入更新Text控件，并只保留最后max_lines行。完整的日志带时间戳写入轮转的日志文件。
+    """
+
+    def __init__(self, root, text, max_lines=DEFAULT_MAX_LINES, log_file=DEFAULT_LOG_FILE,
+                 max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT):
+        self.root = root
+        self.text = text
+        self.max_lines = max_lines
+        self._pending = []  # [(时间, 消息)]
+        self._lock = threading.Lock()
+        self._timer = None
+        self._file_logger = None
+        if log_file:
+            handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            # 独立的logger，不经过根logger输出到控制台
+            self._file_logger = logging.getLogger(f"KNXLogSink.{id(self)}")
+            self._file_logger.propagate = False
+            self._file_logger.setLevel(logging.INFO)
+            self._file_logger.addHandler(handler)
+
+    def start(self):
+        self._timer = self.root.after(FLUSH_INTERVAL, self._tick)
+
+    def write(self, message):
+        with self._lock:
+            self._pending.append((time.time(), message))
+
+    def _tick(self):
+        self.flush()
+        self._timer = self.root.after(FLUSH_INTERVAL, self._tick)
+
+    def flush(self):
+        """把待显示的消息写入文件和日志区域，只能在界面线程中调用"""
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+
+        if self._file_logger is not None:
+            # 一批消息作为一条记录写入，每帧只写一次文件
+            self._file_logger.info("\n".join(
+                f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))} {message}"
+                for timestamp, message in pending
+            ))
+
+        lines = collections.deque((message for _, message in pending), maxlen=self.max_lines)
+        self.text.config(state=tk.NORMAL)
+        self.text.insert(tk.END, "\n".join(lines) + "\n")
+        # 最后一行之后还有一个空行
+        excess = int(self.text.index("end-1c").split(".")[0]) - 1 - self.max_lines
+        if excess > 0:
+            self.text.delete("1.0", f"{excess + 1}.0")
+        self.text.see(tk.END)  # 滚动到底部
+        self.text.config(state=tk.DISABLED)
+
+    def close(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+        self.flush()
+        if self._file_logger is not None:
+            for handler in list(self._file_logger.handlers):
+                handler.close()
+                self._file_logger.removeHandler(handler)
@@ -0,0 +1,217 @@
+import bisect
+import threading
+
+# 延迟直方图的默认桶上界(秒)
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SCAN_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+
+
+def percentile(sorted_values, fraction):
+    """返回已排序列表的百分位数"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}  # 标签值元组 -> 值
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def items(self):
+        """返回[(标签值元组, 值)]的快照"""
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}"]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class _HistogramValue:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self, size):
+        self.counts = [0] * size  # 每个桶(不累计)的计数，最后一个为+Inf
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = _HistogramValue(len(self.buckets) + 1)
+            histogram.counts[index] += 1
+            histogram.total += value
+            histogram.count += 1
+
+    def snapshot(self, **labels):
+        """返回(次数, 总和, 累计计数列表)"""
+        with self._lock:
+            histogram = self._values.get(self._key(labels))
+            if histogram is None:
+                return 0, 0.0, [0] * (len(self.buckets) + 1)
+            cumulative = []
+            running = 0
+            for count in histogram.counts:
+                running += count
+                cumulative.append(running)
+            return histogram.count, histogram.total, cumulative
+
+    def quantile(self, fraction, **labels):
+        """按桶估算分位数(取所在桶的上界)，没有数据时返回0"""
+        count, _, cumulative = self.snapshot(**labels)
+        if not count:
+            return 0.0
+        target = fraction * count
+        for bound, running in zip(self.buckets, cumulative):
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def _render_value(self, key, histogram):
+        label_names = self.label_names + ("le",)
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), histogram.counts):
+            running += count
+            labels = _format_labels(label_names, key + (_format_number(bound),))
+            lines.append(f"{self.name}_bucket{labels} {running}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_number(histogram.total)}")
+        lines.append(f"{self.name}_count{labels} {histogram.count}")
+        return lines
+
+
+class MetricsRegistry:
+    """一组指标，render()输出Prometheus文本格式
+
+    记录指标只是在锁内更新字典，可以在任意线程、发送路径上调用。
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        return self._register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        return self._register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, label_names, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局指标，所有模块共用
+REGISTRY = MetricsRegistry()
+
+CONNECT_SECONDS = REGISTRY.histogram(
+    "knx_connect_seconds", "建立隧道或路由连接的耗时", ("gateway",))
+ACK_SECONDS = REGISTRY.histogram(
+    "knx_telegram_ack_seconds", "报文从进入发送队列到网关确认的耗时", ("gateway",))
+TELEGRAMS_SENT = REGISTRY.counter(
+    "knx_telegrams_sent_total", "已确认的报文数", ("gateway",))
+SEND_ERRORS = REGISTRY.counter(
+    "knx_send_errors_total", "连接或发送失败次数", ("gateway", "error"))
+SCAN_SECONDS = REGISTRY.histogram(
+    "knx_scan_seconds", "网关扫描耗时", ("local_ip",), buckets=SCAN_BUCKETS)
+GATEWAYS_FOUND = REGISTRY.gauge(
+    "knx_gateways_found", "最近一次扫描找到的网关数", ("local_ip",))
+
+
+def summary():
+    """一行一个网关的简要统计，用于定期写入日志"""
+    lines = []
+    errors_by_gateway = {}
+    for (gateway, _), value in SEND_ERRORS.items():
+        errors_by_gateway[gateway] = errors_by_gateway.get(gateway, 0) + value
+    gateways = {key[0] for key, _ in ACK_SECONDS.items()} | set(errors_by_gateway)
+    for gateway in sorted(gateways):
+        count, total, _ = ACK_SECONDS.snapshot(gateway=gateway)
+        errors = errors_by_gateway.get(gateway, 0)
+        if count:
+            lines.append(
+                f"{gateway}: 已发送 {count} 条, 平均确认 {total / count * 1000:.1f} ms, "
+                f"p99 <= {ACK_SECONDS.quantile(0.99, gateway=gateway) * 1000:.0f} ms, 错误 {errors}"
+            )
+        else:
+            lines.append(f"{gateway}: 已发送 0 条, 错误 {errors}")
+    return lines
@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import collections
+import logging
+import os
+import struct
+import time
+from datetime import datetime
+
+from xknx import XKNX
+from xknx.io import ConnectionConfig, ConnectionType
+from xknx.telegram import GroupAddress, IndividualAddress, Telegram, TelegramDirection
+from xknx.telegram.address import InternalGroupAddress
+from xknx.telegram.apci import APCI
+
+from knx_client import KNXClient
+from knx_connection import DEFAULT_GATEWAY_IP, DEFAULT_GATEWAY_PORT, DEFAULT_LOCAL_IP
+
+logger = logging.getLogger("KNXMonitor")
+
+# 文件头: 魔数, 版本, 记录长度, 保留
+HEADER = struct.Struct("<8sHH20x")
+MAGIC = b"KNXMON\x00\x00"
+VERSION = 1
+# 记录: 时间戳(ns), 源地址, 目标地址, 标志, APCI长度, APCI原始字节
+RECORD = struct.Struct("<QHHBB18s")
+RECORD_SIZE = RECORD.size  # 32字节，与文件头等长
+MAX_APCI_LENGTH = 18
+
+FLAG_GROUP = 0x01  # 目标是组地址
+FLAG_OUTGOING = 0x02  # 本机发出的报文
+FLAG_TRUNCATED = 0x04  # APCI超过18字节被截断
+FLAG_NO_PAYLOAD = 0x08  # 没有APCI(传输层控制报文)
+
+# 缓冲多少条记录后立即写盘
+DEFAULT_FLUSH_RECORDS = 4096
+# 最长多久写一次盘(秒)
+DEFAULT_FLUSH_INTERVAL = 1.0
+# 读取时每次读入的记录数
+READ_CHUNK_RECORDS = 16384
+
+TelegramRecord = collections.namedtuple(
+    "TelegramRecord", ["timestamp_ns", "source", "destination", "flags", "apci"]
+)
+
+
+def encode_record(telegram, timestamp_ns=None):
+    """把Telegram编码为一条32字节的定长记录"""
+    flags = 0
+    if isinstance(telegram.destination_address, GroupAddress):
+        flags |= FLAG_GROUP
+    if telegram.direction == TelegramDirection.OUTGOING:
+        flags |= FLAG_OUTGOING
+    if telegram.payload is None:
+        flags |= FLAG_NO_PAYLOAD
+        apci = b""
+    else:
+        apci = bytes(telegram.payload.to_knx())
+        if len(apci) > MAX_APCI_LENGTH:
+            flags |= FLAG_TRUNCATED
+            apci = apci[:MAX_APCI_LENGTH]
+    return RECORD.pack(
+        timestamp_ns if timestamp_ns is not None else time.time_ns(),
+        telegram.source_address.raw,
+        telegram.destination_address.raw,
+        flags,
+        len(apci),
+        apci,
+    )
+
+
+def record_to_telegram(record):
+    """把记录还原为Telegram(被截断的记录不含payload)"""
+    if record.flags & FLAG_GROUP:
+        destination = GroupAddress(record.destination)
+    else:
+        destination = IndividualAddress(record.destination)
+    payload = None
+    if not record.flags & (FLAG_NO_PAYLOAD | FLAG_TRUNCATED):
+        payload = APCI.from_knx(record.apci)
+    return Telegram(
+        destination_address=destination,
+        direction=TelegramDirection.OUTGOING if record.flags & FLAG_OUTGOING else TelegramDirection.INCOMING,
+        payload=payload,
+        source_address=IndividualAddress(record.source),
+    )
+
+
+def format_record(record):
+    timestamp = datetime.fromtimestamp(record.timestamp_ns / 1e9).strftime("%Y/%m/%d %H:%M:%S.%f")[:-3]
+    try:
+        telegram = record_to_telegram(record)
+        payload = telegram.payload if telegram.payload is not None else "-"
+        return f"{timestamp} {telegram.source_address} -> {telegram.destination_address} {payload}"
+    except Exception as e:
+        return f"{timestamp} 无法解析的记录: {e}"
+
+
+class TelegramLogWriter:
+    """追加写入的定长记录二进制日志
+
+    收到报文时只把记录打包进内存缓冲区，由后台任务在缓冲满或定时器到期时
+    于线程池中写盘，接收回调不会被磁盘I/O阻塞。
+    """
+
+    def __init__(self, filename, flush_records=DEFAULT_FLUSH_RECORDS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.filename = filename
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.records_written = 0
+        self._buffer = bytearray()
+        self._buffered_records = 0
+        self._file = None
+        self._flush_task = None
+        self._wakeup = None
+        self._closing = False
+
+    def open(self):
+        self._file = open(self.filename, "ab")
+        size = self._file.tell()
+        if size < HEADER.size:
+            if size:
+                # 上次创建文件时只写了一部分文件头，按新文件重写
+                logger.warning(f"{self.filename} 的文件头不完整，已重写")
+                self._file.truncate(0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD_SIZE))
+        elif (size - HEADER.size) % RECORD_SIZE:
+            # 上次写到一半崩溃，截掉不完整的记录
+            logger.warning(f"{self.filename} 末尾有不完整的记录，已截断")
+            self._file.truncate(size - (size - HEADER.size) % RECORD_SIZE)
+        self._wakeup = asyncio.Event()
+        self._closing = False
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    def append(self, telegram):
+        """接收报文的回调，只在内存中打包"""
+        if isinstance(telegram.destination_address, InternalGroupAddress):
+            return
+        self._buffer += encode_record(telegram)
+        self._buffered_records += 1
+        if self._buffered_records >= self.flush_records:
+            self._wakeup.set()
+
+    async def _flush(self):
+        if not self._buffer:
+            return
+        data, self._buffer = self._buffer, bytearray()
+        count, self._buffered_records = self._buffered_records, 0
+        await asyncio.get_running_loop().run_in_executor(None, self._write, data)
+        self.records_written += count
+
+    def _write(self, data):
+        self._file.write(data)
+        self._file.flush()
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self._flush()
+            except OSError as e:
+                logger.error(f"写入 {self.filename} 失败: {e}")
+            if self._closing:
+                return
+
+    async def close(self):
+        """写入剩余的记录并关闭文件"""
+        if self._flush_task is not None:
+            self._closing = True
+            self._wakeup.set()
+            await self._flush_task
+            self._flush_task = None
+            # 最后一次写盘期间可能又收到了报文
+            await self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def _check_header(f, filename):
+    header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError(f"{filename} 不是有效的总线日志")
+    magic, version, record_size = HEADER.unpack(header)
+    if magic != MAGIC or record_size != RECORD_SIZE:
+        raise ValueError(f"{filename} 不是有效的总线日志")
+
+
+def _seek_time(f, since_ns, record_count):
+    """二分查找第一条时间戳不早于since_ns的记录"""
+    low, high = 0, record_count
+    while low < high:
+        middle = (low + high) // 2
+        f.seek(HEADER.size + middle * RECORD_SIZE)
+        if RECORD.unpack(f.read(RECORD_SIZE))[0] < since_ns:
+            low = middle + 1
+        else:
+            high = middle
+    f.seek(HEADER.size + low * RECORD_SIZE)
+
+
+def iter_records(filename, since=None, until=None, destinations=None, sources=None):
+    """流式读取总线日志，按时间和地址过滤，内存占用与文件大小无关
+
+    since/until为datetime；destinations/sources为地址字符串集合。
+    """
+    since_ns = int(since.timestamp() * 1e9) if since else None
+    until_ns = int(until.timestamp() * 1e9) if until else None
+    destination_raws = {_address_raw(a) for a in destinations} if destinations else None
+    source_raws = {IndividualAddress(a).raw for a in sources} if sources else None
+
+    with open(filename, "rb") as f:
+        _check_header(f, filename)
+        record_count = (os.fstat(f.fileno()).st_size - HEADER.size) // RECORD_SIZE
+        if since_ns:
+            _seek_time(f, since_ns, record_count)
+        buffer = bytearray(READ_CHUNK_RECORDS * RECORD_SIZE)
+        view = memoryview(buffer)
+        while True:
+            size = f.readinto(buffer)
+            remainder = size % RECORD_SIZE
+            if remainder:
+                # 只处理完整的记录，剩余部分下次再读
+                f.seek(-remainder, os.SEEK_CUR)
+                size -= remainder
+            if size <= 0:
+                return
+            for fields in RECORD.iter_unpack(view[:size]):
+                timestamp_ns, source, destination, flags, length, apci = fields
+                if until_ns and timestamp_ns > until_ns:
+                    return
+                if destination_raws is not None and (
+                        destination, bool(flags & FLAG_GROUP)) not in destination_raws:
+                    continue
+                if source_raws is not None and source not in source_raws:
+                    continue
+                yield TelegramRecord(timestamp_ns, source, destination, flags, apci[:length])
+
+
+def _address_raw(address):
+    """地址字符串转换为(原始值, 是否组地址)"""
+    if "/" in address:
+        return (GroupAddress(address).raw, True)
+    return (IndividualAddress(address).raw, False)
+
+
+async def monitor(args):
+    writer = TelegramLogWriter(args.output)
+    writer.open()
+    try:
+        if args.routing:
+            connection_config = ConnectionConfig(
+                connection_type=ConnectionType.ROUTING,
+                local_ip=args.local_ip,
+            )
+            async with XKNX(connection_config=connection_config, telegram_received_cb=writer.append):
+                await _wait_forever(writer)
+        else:
+            async with KNXClient(local_ip=args.local_ip) as client:
+                client.add_telegram_callback(writer.append, args.gateway, args.port)
+                await client.connect(args.gateway, args.port)
+                await _wait_forever(writer)
+    finally:
+        await writer.close()
+        print(f"共记录 {writer.records_written} 条报文到 {args.output}")
+
+
+async def _wait_forever(writer):
+    print(f"正在记录总线报文到 {writer.filename}，按Ctrl+C结束")
+    await asyncio.Event().wait()
+
+
+def replay(args):
+    since = datetime.fromisoformat(args.since) if args.since else None
+    until = datetime.fromisoformat(args.until) if args.until else None
+    previous_ns = None
+    count = 0
+    for record in iter_records(args.logfile, since, until, args.destination, args.source):
+        if args.realtime and previous_ns is not None:
+            time.sleep(max(0.0, (record.timestamp_ns - previous_ns) / 1e9))
+        previous_ns = record.timestamp_ns
+        print(format_record(record))
+        count += 1
+    print(f"共 {count} 条记录")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="KNX总线监视器")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="记录总线报文")
+    record_parser.add_argument("--output", default="knx_bus.log", help="日志文件")
+    record_parser.add_argument("--local-ip", default=DEFAULT_LOCAL_IP, help="本地IP")
+    record_parser.add_argument("--gateway", default=DEFAULT_GATEWAY_IP, help="KNX路由器IP")
+    record_parser.add_argument("--port", type=int, default=DEFAULT_GATEWAY_PORT, help="KNX路由器端口")
+    record_parser.add_argument("--routing", action="store_true", help="使用组播路由代替隧道")
+
+    replay_parser = subparsers.add_parser("replay", help="回放或过滤日志")
+    replay_parser.add_argument("logfile", help="日志文件")
+    replay_parser.add_argument("--since", help="开始时间，如 2024-01-01T08:00")
+    replay_parser.add_argument("--until", help="结束时间")
+    replay_parser.add_argument("--destination", action="append", help="只显示该目标地址(可多次指定)")
+    replay_parser.add_argument("--source", action="append", help="只显示该源地址(可多次指定)")
+    replay_parser.add_argument("--realtime", action="store_true", help="按原始时间间隔回放")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        try:
+            asyncio.run(monitor(args))
+        except KeyboardInterrupt:
+            pass
+    else:
+        replay(args)
+
+
+if __name__ == "__main__":
+    main()
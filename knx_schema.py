@@ -0,0 +1,223 @@
+import csv
+import json
+import logging
+import re
+import xml.etree.ElementTree as ElementTree
+
+from xknx.dpt import DPTBase, DPTString
+from xknx.dpt.dpt_1 import DPT1BitEnum
+from xknx.telegram import GroupAddress, Telegram
+from xknx.telegram.apci import GroupValueWrite
+
+from knx_client import build_telegram, parse_value
+
+logger = logging.getLogger("KNXSchema")
+
+DEFAULT_SCHEMA_FILE = "knx_group_addresses.csv"
+# 每个组地址最多缓存多少个已编码的值
+PAYLOAD_CACHE_SIZE = 256
+
+# ETS中的DPT写法: DPST-9-1 / DPT-5
+ETS_DPT_PATTERN = re.compile(r"DPS?T-(\d+)(?:-(\d+))?", re.IGNORECASE)
+_TRUE_WORDS = {"1", "on", "true", "开"}
+_FALSE_WORDS = {"0", "off", "false", "关"}
+
+
+def parse_dpt(text):
+    """把"9.001"、"DPST-9-1"、"DPT-5"、"temperature"等写法解析为xknx转换类，无法识别时返回None"""
+    text = text.strip()
+    if not text:
+        return None
+    match = ETS_DPT_PATTERN.search(text)
+    if match:
+        main, sub = match.groups()
+        return DPTBase.parse_transcoder({"main": int(main), "sub": int(sub) if sub else None})
+    return DPTBase.parse_transcoder(text)
+
+
+def _parse_bool(text):
+    lowered = text.strip().lower()
+    if lowered in _TRUE_WORDS:
+        return True
+    if lowered in _FALSE_WORDS:
+        return False
+    raise ValueError(f"无效的开关值: {text}")
+
+
+def _parse_binary(text):
+    """不在组地址表中的组地址按1位二进制值处理，只接受整数和开关值"""
+    lowered = text.strip().lower()
+    if lowered in _TRUE_WORDS:
+        return True
+    if lowered in _FALSE_WORDS:
+        return False
+    try:
+        return int(lowered)
+    except ValueError:
+        raise ValueError(f"组地址没有DPT，值必须是整数或开关值(0/1、on/off): {text}") from None
+
+
+def _parse_json_or_number(text):
+    text = text.strip()
+    if text.startswith("{"):
+        return json.loads(text)  # 如DPT 3调光: {"control": "increase", "step_code": 3}
+    return parse_value(text)
+
+
+class SchemaEntry:
+    """一个组地址及其预先确定的编码方式"""
+
+    __slots__ = ("group_address", "name", "dpt", "transcoder", "parse", "_payloads")
+
+    def __init__(self, group_address, transcoder, name=""):
+        self.group_address = group_address
+        self.name = name
+        self.transcoder = transcoder
+        self.dpt = transcoder.dpt_number_str() if hasattr(transcoder, "dpt_number_str") else transcoder.__name__
+        # 文本值的解析函数也在加载时确定
+        if issubclass(transcoder, DPT1BitEnum):
+            self.parse = _parse_bool
+        elif issubclass(transcoder, DPTString):
+            self.parse = str
+        else:
+            self.parse = _parse_json_or_number
+        self._payloads = {}
+
+    def payload(self, value):
+        """编码值为GroupValueWrite，相同的值只编码一次"""
+        try:
+            return self._payloads[value]
+        except KeyError:
+            pass
+        except TypeError:
+            # 不可哈希的值(如字典)不缓存
+            return GroupValueWrite(self.transcoder.to_knx(value))
+        payload = GroupValueWrite(self.transcoder.to_knx(value))
+        if len(self._payloads) < PAYLOAD_CACHE_SIZE:
+            self._payloads[value] = payload
+        return payload
+
+    def telegram(self, value):
+        return Telegram(destination_address=self.group_address, payload=self.payload(value))
+
+
+class GroupAddressSchema:
+    """组地址表: 组地址 -> DPT
+
+    加载时为每个组地址解析好DPT转换类，发送时只需一次字典查找，不再解析类型。
+    支持的文件格式:
+      - 简单CSV: 组地址,DPT[,名称]
+      - ETS导出的CSV(含Address和DatapointType列，逗号、分号或制表符分隔)
+      - ETS导出的XML(GroupAddress元素的Address和DPTs属性)
+    """
+
+    def __init__(self):
+        self._entries = {}  # 组地址字符串 -> SchemaEntry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, group_address):
+        return self.get(group_address) is not None
+
+    def add(self, group_address, dpt, name=""):
+        transcoder = parse_dpt(dpt) if isinstance(dpt, str) else dpt
+        if transcoder is None:
+            raise ValueError(f"未知的DPT: {dpt}")
+        group_address = GroupAddress(group_address)
+        entry = SchemaEntry(group_address, transcoder, name)
+        self._entries[str(group_address)] = entry
+        return entry
+
+    def get(self, group_address):
+        """查找组地址，返回SchemaEntry或None"""
+        entry = self._entries.get(group_address if isinstance(group_address, str) else str(group_address))
+        if entry is None and isinstance(group_address, str):
+            # 写法不标准(如有空格或前导0)时再按组地址解析一次
+            try:
+                entry = self._entries.get(str(GroupAddress(group_address)))
+            except Exception:
+                return None
+        return entry
+
+    def parse(self, group_address, text):
+        """按组地址的DPT把文本转换为值，不在表中的组地址只接受整数和开关值，无效时抛出ValueError"""
+        entry = self.get(group_address)
+        return entry.parse(text) if entry is not None else _parse_binary(text)
+
+    def telegram(self, group_address, value, dpt=None):
+        """创建GroupValueWrite报文，指定dpt时优先使用，否则使用组地址表中的DPT，都没有时按1位二进制值处理"""
+        if not dpt:
+            entry = self.get(group_address)
+            if entry is not None:
+                return entry.telegram(value)
+        return build_telegram(group_address, value, dpt)
+
+    # ---------- 加载 ----------
+
+    @classmethod
+    def load(cls, filename):
+        schema = cls()
+        if filename.lower().endswith(".xml"):
+            rows = _read_ets_xml(filename)
+        else:
+            rows = _read_csv(filename)
+        skipped = 0
+        for group_address, dpt, name in rows:
+            if not dpt:
+                skipped += 1
+                continue
+            try:
+                schema.add(group_address, dpt, name)
+            except Exception as e:
+                logger.warning(f"{filename}: 跳过 {group_address} ({dpt}): {e}")
+                skipped += 1
+        logger.info(f"从 {filename} 加载了 {len(schema)} 个组地址，跳过 {skipped} 个")
+        return schema
+
+
+def _read_csv(filename):
+    """产出(组地址, DPT, 名称)"""
+    with open(filename, newline="", encoding="utf-8-sig", errors="replace") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        columns = [column.strip().lower() for column in header]
+        if "address" in columns and "datapointtype" in columns:
+            # ETS导出格式
+            address_column = columns.index("address")
+            dpt_column = columns.index("datapointtype")
+            name_column = columns.index("group name") if "group name" in columns else None
+        else:
+            address_column, dpt_column, name_column = 0, 1, 2
+            if header and "/" in header[0]:
+                reader = _chain([header], reader)  # 没有标题行
+        for row in reader:
+            if len(row) <= max(address_column, dpt_column) or row[address_column].strip().startswith("#"):
+                continue
+            address = row[address_column].strip()
+            if "/" not in address:
+                continue  # ETS导出中的主组/中间组行
+            name = row[name_column].strip() if name_column is not None and len(row) > name_column else ""
+            yield address, row[dpt_column].strip(), name
+
+
+def _chain(*iterables):
+    for iterable in iterables:
+        yield from iterable
+
+
+def _read_ets_xml(filename):
+    """流式读取ETS导出的XML，产出(组地址, DPT, 名称)"""
+    for _, element in ElementTree.iterparse(filename):
+        if element.tag.rsplit("}", 1)[-1] == "GroupAddress":
+            dpts = element.get("DPTs", "")
+            yield element.get("Address", ""), dpts.split(",")[0].strip(), element.get("Name", "")
+        element.clear()
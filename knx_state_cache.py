@@ -0,0 +1,160 @@
+import asyncio
+import collections
+import logging
+import time
+
+from xknx.dpt import DPTBase
+from xknx.telegram import GroupAddress, Telegram
+from xknx.telegram.apci import GroupValueRead, GroupValueResponse, GroupValueWrite
+
+from knx_connection import DEFAULT_GATEWAY_PORT
+
+logger = logging.getLogger("KNXStateCache")
+
+# 缓存值的默认最大有效期(秒)，超过后再次查询会读取总线
+DEFAULT_MAX_AGE = 300.0
+# 默认最多缓存多少个组地址
+DEFAULT_MAX_ENTRIES = 10000
+# 等待GroupValueResponse的超时时间(秒)
+DEFAULT_READ_TIMEOUT = 2.0
+
+
+class GroupStateCache:
+    """组地址状态缓存
+
+    被动接收总线上的GroupValueWrite/GroupValueResponse更新缓存；查询时只有
+    未命中或值已过期才发送GroupValueRead，同一组地址的并发查询只读一次总线。
+    按LRU淘汰，值变化时通知监听者。
+    """
+
+    def __init__(self, client, max_age=DEFAULT_MAX_AGE, max_entries=DEFAULT_MAX_ENTRIES,
+                 read_timeout=DEFAULT_READ_TIMEOUT):
+        self.client = client
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.read_timeout = read_timeout
+        self._entries = collections.OrderedDict()  # GroupAddress -> (payload, 更新时间)
+        self._pending_reads = {}  # GroupAddress -> Future
+        self._listeners = []  # [(回调, GroupAddress或None)]
+        self._gateway = (None, DEFAULT_GATEWAY_PORT, None)
+        self._remove_callback = None
+        self.hits = 0
+        self.misses = 0
+        self.bus_reads = 0
+        self.evictions = 0
+
+    def attach(self, gateway_ip=None, gateway_port=DEFAULT_GATEWAY_PORT, local_ip=None):
+        """订阅网关的报文，只能在客户端的事件循环中调用"""
+        self.detach()
+        self._gateway = (gateway_ip, gateway_port, local_ip)
+        self._remove_callback = self.client.add_telegram_callback(self.update, *self._gateway)
+
+    def detach(self):
+        if self._remove_callback is not None:
+            self._remove_callback()
+            self._remove_callback = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add_listener(self, callback, group_address=None):
+        """注册值变化回调callback(组地址, 新payload, 旧payload)，返回注销函数"""
+        listener = (callback, GroupAddress(group_address) if group_address is not None else None)
+        self._listeners.append(listener)
+
+        def remove():
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+        return remove
+
+    def update(self, telegram):
+        """处理一条报文，写入和响应报文会更新缓存"""
+        if not isinstance(telegram.destination_address, GroupAddress):
+            return
+        if not isinstance(telegram.payload, (GroupValueWrite, GroupValueResponse)):
+            return
+        group_address = telegram.destination_address
+        payload = telegram.payload.value
+        old = self._entries.pop(group_address, None)
+        self._entries[group_address] = (payload, time.monotonic())
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        future = self._pending_reads.pop(group_address, None)
+        if future is not None and not future.done():
+            future.set_result(payload)
+
+        old_payload = old[0] if old is not None else None
+        if payload != old_payload:
+            for callback, address in list(self._listeners):
+                if address is None or address == group_address:
+                    try:
+                        callback(group_address, payload, old_payload)
+                    except Exception:
+                        logger.exception("状态变化回调出错")
+
+    def peek(self, group_address, max_age=None):
+        """只查缓存，不读总线，未命中或过期返回None"""
+        group_address = GroupAddress(group_address)
+        entry = self._entries.get(group_address)
+        if entry is None:
+            return None
+        max_age = self.max_age if max_age is None else max_age
+        if time.monotonic() - entry[1] > max_age:
+            return None
+        self._entries.move_to_end(group_address)
+        return entry[0]
+
+    async def get(self, group_address, max_age=None, dpt=None):
+        """返回组地址的当前值，必要时发送GroupValueRead
+
+        返回原始payload(DPTBinary/DPTArray)；指定dpt时返回解码后的值。
+        """
+        group_address = GroupAddress(group_address)
+        payload = self.peek(group_address, max_age)
+        if payload is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            payload = await self._read(group_address)
+        if dpt is None:
+            return payload
+        return DPTBase.parse_transcoder(dpt).from_knx(payload)
+
+    async def get_many(self, group_addresses, max_age=None):
+        """批量查询，返回{组地址字符串: payload}，读取失败的值为None"""
+        results = await asyncio.gather(
+            *(self.get(address, max_age) for address in group_addresses),
+            return_exceptions=True
+        )
+        return {
+            str(address): None if isinstance(result, Exception) else result
+            for address, result in zip(group_addresses, results)
+        }
+
+    async def _read(self, group_address):
+        future = self._pending_reads.get(group_address)
+        if future is None:
+            # 同一组地址的并发查询共用一次总线读取
+            future = asyncio.get_running_loop().create_future()
+            self._pending_reads[group_address] = future
+            self.bus_reads += 1
+            try:
+                await self.client.send_telegram(
+                    Telegram(destination_address=group_address, payload=GroupValueRead()),
+                    *self._gateway
+                )
+            except Exception as e:
+                self._pending_reads.pop(group_address, None)
+                future.set_exception(e)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.read_timeout)
+        except asyncio.TimeoutError:
+            error = TimeoutError(f"读取 {group_address} 超时")
+            if self._pending_reads.get(group_address) is future:
+                del self._pending_reads[group_address]
+                future.set_exception(error)
+                future.exception()  # 已由本次调用报告
+            raise error from None
@@ -1,28 +1,32 @@
-import asyncio
+import os
 import socket
-import threading
 import tkinter as tk
-from tkinter import ttk
-from xknx import XKNX
-from xknx.io import ConnectionConfig, GatewayScanner, ConnectionType  # 添加ConnectionType导入
-from xknx.dpt import DPTBinary
-from xknx.telegram import GroupAddress, Telegram
-from xknx.telegram.apci import GroupValueWrite
+from tkinter import filedialog, ttk
 import logging
 import time
 import re
-import netifaces
-
-# 配置日志记录
-logging.basicConfig(level=logging.DEBUG)
+from gateway_cache import GatewayCache, revalidate
+from knx_client import KNXClient, get_local_ips
+from knx_connection import DEFAULT_GATEWAY_PORT, DEFAULT_MULTICAST_GROUP
+from knx_discovery import DEFAULT_QUIET_PERIOD
+from knx_gateway_pool import GatewayPool
+from knx_log_sink import LogSink
+from knx_metrics import summary as metrics_summary
+from knx_schema import DEFAULT_SCHEMA_FILE, GroupAddressSchema
+
+# 配置日志记录(DEBUG会在发送路径上输出大量日志，需要时再打开)
+logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("KNXController")
 
+# 定期把发送统计写入日志的间隔(毫秒)
+METRICS_DUMP_INTERVAL = 60000
+
 
 class KNXControllerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("KNX控制器")
-        self.root.geometry("600x550")
+        self.root.geometry("600x600")
         self.root.resizable(True, True)
 
         # 创建主框架
@@ -32,6 +36,9 @@ class KNXControllerApp:
         # 获取本地IP地址
         self.local_ips = self.get_local_ips()
 
+        # 组地址表：组地址 -> DPT，未加载时所有组地址按开关量发送
+        self.schema = GroupAddressSchema()
+
         # 创建UI
         self.create_ui()
 
@@ -42,22 +49,28 @@ class KNXControllerApp:
         self.scan_running = False
         self.scan_progress = 0
         self.scan_start_time = 0
+        self.discovery = None
+
+        # KNX客户端：扫描和发送共用一个后台事件循环，每个网关一条隧道
+        self.client = KNXClient()
+        self.client.start()
+
+        # 负载均衡时在所有扫描到的路由器之间分配报文
+        self.gateway_pool = GatewayPool(self.client)
+
+        # 启动时直接使用缓存的路由器，并在后台验证
+        self.gateway_cache = GatewayCache()
+        self.load_cached_gateways()
+
+        if os.path.exists(DEFAULT_SCHEMA_FILE):
+            self.load_schema(DEFAULT_SCHEMA_FILE)
+
+        self.root.after(METRICS_DUMP_INTERVAL, self.dump_metrics)
 
     def get_local_ips(self):
         """获取所有本地IP地址"""
-        ips = []
-        try:
-            # 使用netifaces获取所有网络接口信息
-            interfaces = netifaces.interfaces()
-            for interface in interfaces:
-                ifaddresses = netifaces.ifaddresses(interface)
-                if netifaces.AF_INET in ifaddresses:
-                    for link in ifaddresses[netifaces.AF_INET]:
-                        ip = link['addr']
-                        if ip != "127.0.0.1":  # 排除回环地址
-                            ips.append(ip)
-        except Exception as e:
-            logger.error(f"获取IP地址失败: {e}")
+        ips = get_local_ips()
+        if not ips:
             ips = ["192.168.0.24"]  # 默认值
         return ips
 
@@ -91,6 +104,22 @@ class KNXControllerApp:
         )
         self.scan_button.pack(side=tk.LEFT)
 
+        # 扫描设置
+        scan_frame = ttk.Frame(self.main_frame)
+        scan_frame.pack(fill=tk.X, pady=(0, 15))
+
+        ttk.Label(scan_frame, text="预期路由器数(0=不限):").pack(side=tk.LEFT, padx=(0, 5))
+        self.expected_count_var = tk.StringVar(value="0")
+        ttk.Spinbox(scan_frame, from_=0, to=99, textvariable=self.expected_count_var, width=5).pack(
+            side=tk.LEFT, padx=(0, 20))
+
+        ttk.Label(scan_frame, text="静默时间(秒):").pack(side=tk.LEFT, padx=(0, 5))
+        self.quiet_period_var = tk.StringVar(value=str(DEFAULT_QUIET_PERIOD))
+        ttk.Entry(scan_frame, textvariable=self.quiet_period_var, width=6).pack(side=tk.LEFT, padx=(0, 20))
+
+        self.scan_all_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(scan_frame, text="扫描所有接口", variable=self.scan_all_var).pack(side=tk.LEFT)
+
         # 路由器选择
         gateway_frame = ttk.LabelFrame(self.main_frame, text="KNX路由器", padding="10")
         gateway_frame.pack(fill=tk.X, pady=(0, 15))
@@ -129,6 +158,32 @@ class KNXControllerApp:
         # 添加文本变化监听
         self.manual_port_var.trace_add("write", self.validate_manual_input)
 
+        # 组播路由模式：不占用路由器的隧道连接
+        self.routing_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            manual_frame,
+            text="组播路由",
+            variable=self.routing_var,
+            command=self.on_routing_toggled
+        ).pack(side=tk.LEFT, padx=(10, 0))
+
+        # 多路由器负载均衡
+        pool_frame = ttk.Frame(self.main_frame)
+        pool_frame.pack(fill=tk.X, pady=(0, 5))
+
+        self.balance_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            pool_frame,
+            text="在所有路由器之间负载均衡(超时自动切换)",
+            variable=self.balance_var
+        ).pack(side=tk.LEFT)
+
+        ttk.Button(
+            pool_frame,
+            text="路由器状态",
+            command=self.show_gateway_stats
+        ).pack(side=tk.RIGHT)
+
         # 进度条区域
         progress_frame = ttk.Frame(self.main_frame)
         progress_frame.pack(fill=tk.X, pady=(10, 15))
@@ -169,6 +224,17 @@ class KNXControllerApp:
         self.group_entry.pack(side=tk.LEFT, padx=(0, 20))
         self.group_entry.insert(0, "0/2/7")  # 默认组地址
 
+        # 当前组地址在组地址表中的DPT
+        self.dpt_label = ttk.Label(group_frame, text="")
+        self.dpt_label.pack(side=tk.LEFT)
+        self.group_var.trace_add("write", lambda *args: self.update_dpt_label())
+
+        ttk.Button(
+            group_frame,
+            text="加载组地址表...",
+            command=self.choose_schema_file
+        ).pack(side=tk.RIGHT)
+
         # 值输入
         value_frame = ttk.Frame(command_frame)
         value_frame.pack(fill=tk.X, pady=5)
@@ -202,6 +268,10 @@ class KNXControllerApp:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.log_text.config(yscrollcommand=scrollbar.set)
 
+        # 日志区域只保留最后的若干行，完整日志写入轮转的日志文件
+        self.log_sink = LogSink(self.root, self.log_text)
+        self.log_sink.start()
+
         # 初始化后验证一次手动输入
         self.validate_manual_input()
 
@@ -233,11 +303,8 @@ class KNXControllerApp:
             self.log_message("请检查手动输入的路由器IP和端口")
 
     def log_message(self, message):
-        """向日志区域添加消息"""
-        self.log_text.config(state=tk.NORMAL)
-        self.log_text.insert(tk.END, f"{message}\n")
-        self.log_text.see(tk.END)  # 滚动到底部
-        self.log_text.config(state=tk.DISABLED)
+        """向日志区域添加消息，可在任意线程调用，日志区域每帧合并刷新一次"""
+        self.log_sink.write(message)
 
     def on_ip_selected(self, event=None):
         """当选择本地IP时"""
@@ -245,10 +312,62 @@ class KNXControllerApp:
         self.log_message(f"已选择本地IP: {self.selected_local_ip}")
         self.gateway_combo.set('')  # 清空路由器选择
         self.send_button.config(state=tk.DISABLED)
+        self.load_cached_gateways()
+
+    def load_cached_gateways(self):
+        """加载当前本地IP缓存的路由器，立即可用，同时在后台用单播描述请求验证"""
+        local_ip = self.selected_local_ip
+        if not local_ip:
+            return
+        cached = self.gateway_cache.get(local_ip)
+        self.gateways = cached
+        self.selected_gateway = None
+        self.update_gateway_list()
+        if not cached:
+            return
+
+        self.log_message(f"已加载 {len(cached)} 个缓存的路由器，正在后台验证...")
+        self.gateway_combo.current(0)
+        self.on_gateway_selected()
+
+        future = self.client.submit(revalidate(self.gateway_cache, local_ip, cached))
+        future.add_done_callback(
+            lambda future: self.root.after(0, self.apply_revalidated_gateways, local_ip, future)
+        )
+
+    def apply_revalidated_gateways(self, local_ip, future):
+        """后台验证完成，移除已离线的路由器"""
+        if local_ip != self.selected_local_ip or self.scan_running:
+            return  # 接口已切换或已开始重新扫描
+        try:
+            valid = future.result()
+        except Exception as e:
+            self.log_message(f"验证缓存路由器出错: {str(e)}")
+            return
+        if not valid:
+            self.log_message("缓存的路由器均未响应，请重新扫描")
+            return
+
+        selected = self.selected_gateway
+        self.gateways = valid
+        self.update_gateway_list()
+        valid_keys = [(gw["ip"], gw["port"]) for gw in valid]
+        if selected and (selected["ip"], selected["port"]) in valid_keys:
+            index = valid_keys.index((selected["ip"], selected["port"]))
+        else:
+            index = 0
+        self.gateway_combo.current(index)
+        self.on_gateway_selected()
+        self.log_message(f"缓存验证完成，{len(valid)} 个路由器在线")
+
+        # 预先建立隧道连接，第一条命令无需等待握手
+        gateway = self.selected_gateway
+        self.client.submit(self.client.connect(gateway["ip"], gateway["port"], gateway.get("local_ip") or local_ip))
 
     def start_scan(self):
-        """启动扫描线程"""
-        if not self.selected_local_ip:
+        """启动扫描"""
+        scan_all = self.scan_all_var.get()
+        if not scan_all and not self.selected_local_ip:
             self.log_message("请先选择本地IP地址")
             return
 
@@ -256,10 +375,26 @@ class KNXControllerApp:
             self.log_message("扫描正在进行中，请稍候...")
             return
 
-        self.log_message(f"开始扫描网络中的KNX路由器(使用{self.selected_local_ip})...")
+        try:
+            expected_count = int(self.expected_count_var.get() or 0)
+            quiet_period = float(self.quiet_period_var.get() or DEFAULT_QUIET_PERIOD)
+        except ValueError:
+            self.log_message("错误: 预期路由器数和静默时间必须是数字")
+            return
+
+        if scan_all:
+            self.log_message(f"开始在所有接口上扫描KNX路由器({', '.join(self.local_ips)})...")
+        else:
+            self.log_message(f"开始扫描网络中的KNX路由器(使用{self.selected_local_ip})...")
         self.scan_button.config(state=tk.DISABLED)
         self.scan_running = True
 
+        # 清空上次的扫描结果
+        self.gateways = []
+        self.selected_gateway = None
+        self.gateway_combo.config(values=[])
+        self.gateway_combo.set('')
+
         # 显示进度条
         self.progress_label.pack(side=tk.LEFT, padx=(0, 10))
         self.progress_bar.pack(fill=tk.X, expand=True)
@@ -271,120 +406,51 @@ class KNXControllerApp:
         self.progress_var.set(0)
         self.progress_value.config(text="0%")
 
+        # 选择所有接口时，各接口在同一个事件循环中并行扫描
+        self.discovery = self.client.discovery(
+            self.selected_local_ip,
+            all_interfaces=scan_all,
+            expected_count=expected_count,
+            quiet_period=quiet_period,
+        )
+
         # 启动进度更新
         self.update_progress()
 
-        # 在新线程中运行扫描
-        threading.Thread(
-            target=self.scan_network,
-            args=(self.selected_local_ip,),  # 传递选择的本地IP
-            daemon=True
-        ).start()
+        # 在后台事件循环中运行扫描
+        self.client.submit(self.scan_network(self.discovery))
 
     def update_progress(self):
         """更新扫描进度条"""
         if not self.scan_running:
             return
 
-        # 计算已用时间
-        elapsed = time.time() - self.scan_start_time
-
-        # 计算进度 (假设扫描总时间为15秒)
-        self.scan_progress = min(100, int(elapsed / 15 * 100))
+        # 根据已找到的路由器数量和剩余等待时间计算真实进度
+        self.scan_progress = int(self.discovery.progress * 100)
 
         # 更新UI
         self.progress_var.set(self.scan_progress)
         self.progress_value.config(text=f"{self.scan_progress}%")
 
-        # 每100毫秒更新一次
+        # 每50毫秒更新一次
         if self.scan_progress < 100:
-            self.root.after(100, self.update_progress)
-
-    def scan_network(self, local_ip):
-        """扫描网络中的KNX路由器"""
+            self.root.after(50, self.update_progress)
 
-        async def scan():
-            try:
-                # 创建连接配置，强制使用指定的本地IP
-                connection_config = ConnectionConfig(
-                    local_ip=local_ip,
-                    gateway_ip=None,  # 扫描时不需要指定网关IP
-                    gateway_port=None,
-                    auto_reconnect=False,
-                    auto_reconnect_wait=3,
-                    connection_type=ConnectionType.TUNNELING,  # 使用ConnectionType枚举
-                )
-
-                # 创建XKNX实例，使用指定的连接配置
-                async with XKNX(connection_config=connection_config) as xknx:
-                    # 创建网关扫描器
-                    gateway_scanner = GatewayScanner(xknx)
-
-                    # 强制使用选择的接口
-                    gateway_scanner.local_ip = local_ip
-
-                    # 禁用自动接口选择
-                    gateway_scanner.bind_to_multicast = False
-
-                    # 设置组播地址
-                    gateway_scanner.multicast_group = "224.0.23.12"
-
-                    # 开始扫描
-                    self.log_message("正在扫描... (这可能需要10-15秒)")
-
-                    # 根据版本选择正确的方法
-                    if hasattr(gateway_scanner, 'scan'):
-                        await gateway_scanner.scan()
-                    elif hasattr(gateway_scanner, 'start'):
-                        await gateway_scanner.start()
-                    else:
-                        self.log_message("错误: 不支持的扫描方法")
-                        return
-
-                    # 等待扫描结果 (增加扫描时间)
-                    await asyncio.sleep(15)
-
-                    # 获取扫描结果
-                    found_gateways = gateway_scanner.found_gateways
-
-                    # 修复错误：正确处理HPAI对象
-                    self.gateways = []
-                    for gw in found_gateways:
-                        # 检查是否是GatewayDescriptor对象
-                        if hasattr(gw, 'name'):
-                            # GatewayDescriptor对象有name属性
-                            gateway_info = {
-                                "name": gw.name,
-                                "ip": gw.ip_addr,
-                                "port": gw.port
-                            }
-                        else:
-                            # HPAI对象没有name属性
-                            gateway_info = {
-                                "name": f"路由器 {gw.ip_addr}:{gw.port}",
-                                "ip": gw.ip_addr,
-                                "port": gw.port
-                            }
-                        self.gateways.append(gateway_info)
-
-                    # 更新UI
-                    self.root.after(0, self.update_gateway_list)
-
-                    self.log_message(f"扫描完成，找到 {len(self.gateways)} 个路由器")
-            except Exception as e:
-                # 修复错误：使用默认参数传递异常对象
-                self.root.after(0, lambda e=e: self.log_message(f"扫描错误: {str(e)}"))
-            finally:
-                self.root.after(0, lambda: self.scan_button.config(state=tk.NORMAL))
-                self.scan_running = False
-                # 隐藏进度条
-                self.root.after(0, self.hide_progress_bar)
-
-        # 创建新的事件循环
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(scan())
-        loop.close()
+    async def scan_network(self, discovery):
+        """扫描网络中的KNX路由器，每收到一个响应就更新下拉列表"""
+        try:
+            async for gateway_info in discovery.stream():
+                self.root.after(0, self.add_gateway, gateway_info)
+            if discovery.found:
+                await self.gateway_cache.put_all_async(discovery.found)
+            self.root.after(0, self.finish_scan, len(discovery.found), discovery.duration)
+        except Exception as e:
+            self.log_message(f"扫描错误: {str(e)}")
+        finally:
+            self.root.after(0, lambda: self.scan_button.config(state=tk.NORMAL))
+            self.scan_running = False
+            # 隐藏进度条
+            self.root.after(0, self.hide_progress_bar)
 
     def hide_progress_bar(self):
         """隐藏进度条"""
@@ -392,14 +458,19 @@ class KNXControllerApp:
         self.progress_bar.pack_forget()
         self.progress_value.pack_forget()
 
-    def update_gateway_list(self):
-        """更新路由器下拉列表"""
-        gateway_names = [f"{gw['name']} ({gw['ip']}:{gw['port']})" for gw in self.gateways]
-        self.gateway_combo.config(values=gateway_names)
-
-        if gateway_names:
+    def add_gateway(self, gateway_info):
+        """把新发现的路由器加入下拉列表，第一个路由器自动选中"""
+        self.gateways.append(gateway_info)
+        self.update_gateway_list()
+        self.log_message(f"发现路由器: {self.format_gateway(gateway_info)}")
+        if len(self.gateways) == 1:
             self.gateway_combo.current(0)
             self.on_gateway_selected()
+
+    def finish_scan(self, count, duration):
+        """扫描结束"""
+        self.log_message(f"扫描完成，找到 {count} 个路由器 (耗时 {duration:.2f} s)")
+        if count:
             self.log_message("请从下拉列表中选择一个路由器")
         else:
             self.log_message("未找到任何KNX路由器")
@@ -411,6 +482,21 @@ class KNXControllerApp:
             }
             self.log_message("已使用手动输入的IP和端口")
 
+    def format_gateway(self, gateway):
+        """路由器在下拉列表中的显示文本，多接口扫描时标注到达它的本地接口"""
+        text = f"{gateway['name']} ({gateway['ip']}:{gateway['port']})"
+        if "interfaces" in gateway:
+            text += f" 经 {gateway['local_ip']}"
+        return text
+
+    def update_gateway_list(self):
+        """更新路由器下拉列表"""
+        gateway_names = [self.format_gateway(gw) for gw in self.gateways]
+        self.gateway_combo.config(values=gateway_names)
+        self.gateway_pool.update([
+            dict(gw, local_ip=gw.get("local_ip") or self.selected_local_ip) for gw in self.gateways
+        ])
+
     def on_gateway_selected(self, event=None):
         """当选择路由器时"""
         selected_index = self.gateway_combo.current()
@@ -422,14 +508,30 @@ class KNXControllerApp:
             self.selected_gateway = None
             self.send_button.config(state=tk.DISABLED)
 
+    def on_routing_toggled(self):
+        """切换组播路由模式"""
+        if self.routing_var.get():
+            self.send_button.config(state=tk.NORMAL)
+            self.log_message(f"组播路由模式: 报文直接发送到 {DEFAULT_MULTICAST_GROUP}:{DEFAULT_GATEWAY_PORT}")
+        else:
+            self.log_message("已切换回隧道模式")
+            self.validate_manual_input()
+
     def send_command(self):
         """发送KNX命令"""
         if not self.selected_local_ip:
             self.log_message("错误: 请先选择本地IP地址")
             return
 
+        gateway = None
+        if self.routing_var.get():
+            gateway = {
+                "ip": DEFAULT_MULTICAST_GROUP,
+                "port": DEFAULT_GATEWAY_PORT,
+                "local_ip": self.selected_local_ip
+            }
         # 如果没有扫描到路由器，使用手动输入的值
-        if not self.selected_gateway:
+        elif not self.selected_gateway:
             try:
                 # 验证IP地址格式
                 ip = self.manual_ip_var.get().strip()
@@ -465,67 +567,126 @@ class KNXControllerApp:
             return
 
         try:
-            # 转换值
-            value = int(value_str)
-        except ValueError:
-            self.log_message("错误: 值必须是整数")
+            # 按组地址表中的DPT转换值
+            value = self.schema.parse(group_address, value_str)
+        except ValueError as e:
+            self.log_message(f"错误: 无效的值 {value_str}: {str(e)}")
             return
 
-        # 在新线程中发送命令
-        threading.Thread(
-            target=self.send_knx_command,
-            args=(group_address, value),
-            daemon=True
-        ).start()
+        # 通过连接池异步发送命令
+        self.send_knx_command(group_address, value, gateway)
 
-    def send_knx_command(self, group_address, value):
-        """实际发送KNX命令"""
+    def send_knx_command(self, group_address, value, gateway=None):
+        """实际发送KNX命令，gateway为None时发送到当前选择的路由器(或负载均衡)"""
+        if gateway is None and self.balance_var.get() and len(self.gateway_pool) > 1:
+            self.send_knx_command_balanced(group_address, value)
+            return
 
-        async def send():
-            try:
-                # 配置连接参数
-                connection_config = ConnectionConfig(
-                    local_ip=self.selected_local_ip,
-                    gateway_ip=self.selected_gateway["ip"],
-                    gateway_port=self.selected_gateway["port"],
-                )
+        gateway = gateway or self.selected_gateway
+        gateway_ip = gateway["ip"]
+        gateway_port = gateway["port"]
+        # 多接口扫描到的路由器使用到达它的那个本地接口
+        local_ip = gateway.get("local_ip") or self.selected_local_ip
 
-                self.log_message(f"正在连接到 {self.selected_gateway['ip']}:{self.selected_gateway['port']}...")
+        try:
+            # 创建目标组地址和有效载荷，不在组地址表中的组地址按开关量处理
+            telegram = self.schema.telegram(group_address, value)
+        except Exception as e:
+            self.log_message(f"错误: {str(e)}")
+            return
 
-                # 创建XKNX实例
-                async with XKNX(connection_config=connection_config) as xknx:
-                    self.log_message("连接成功")
+        if not self.client.is_connected(gateway_ip, gateway_port, local_ip):
+            self.log_message(f"正在连接到 {gateway_ip}:{gateway_port}...")
 
-                    # 创建目标组地址
-                    ga = GroupAddress(group_address)
+        future = self.client.submit(
+            self.client.send_telegram(telegram, gateway_ip, gateway_port, local_ip)
+        )
 
-                    # 创建有效载荷
-                    payload = GroupValueWrite(value=DPTBinary(value))
+        def on_done(future):
+            try:
+                latency = future.result()
+                message = f"命令已发送到 {group_address}: 值={value} (确认耗时 {latency * 1000:.0f} ms)"
+            except Exception as e:
+                message = f"错误: {str(e)}"
+            self.log_message(message)
 
-                    # 创建并发送Telegram
-                    telegram = Telegram(
-                        destination_address=ga,
-                        payload=payload
-                    )
-                    await xknx.telegrams.put(telegram)
-                    self.log_message(f"命令已发送到 {group_address}: 值={value}")
+        future.add_done_callback(on_done)
 
-                    # 等待命令完成
-                    await asyncio.sleep(1)
+    def send_knx_command_balanced(self, group_address, value):
+        """通过路由器池发送，由池选择最空闲的路由器，失败时自动换下一个"""
+        try:
+            telegram = self.schema.telegram(group_address, value)
+        except Exception as e:
+            self.log_message(f"错误: {str(e)}")
+            return
 
-                self.log_message("已断开连接")
+        future = self.client.submit(self.gateway_pool.send_telegram(telegram))
 
+        def on_done(future):
+            try:
+                latency, gateway = future.result()
+                message = (f"命令已经 {gateway.name} 发送到 {group_address}: 值={value} "
+                           f"(确认耗时 {latency * 1000:.0f} ms)")
             except Exception as e:
-                self.log_message(f"错误: {str(e)}")
+                message = f"错误: 所有路由器均发送失败: {str(e)}"
+            self.log_message(message)
+
+        future.add_done_callback(on_done)
+
+    def show_gateway_stats(self):
+        """在日志中显示各路由器的发送统计"""
+        stats = self.gateway_pool.stats()
+        if not stats:
+            self.log_message("路由器池为空，请先扫描")
+            return
+        for item in stats:
+            latency = f"{item['latency_ms']} ms" if item["latency_ms"] is not None else "-"
+            state = "正常" if item["healthy"] else f"暂停 ({item['last_error']})"
+            self.log_message(f"{item['name']} ({item['gateway']}): 成功 {item['sent']}, "
+                             f"失败 {item['failures']}, 平均确认 {latency}, {state}")
+
+    def dump_metrics(self):
+        """定期把各路由器的发送次数、确认延迟和错误数写入日志"""
+        for line in metrics_summary():
+            logger.info(line)
+        self.root.after(METRICS_DUMP_INTERVAL, self.dump_metrics)
+
+    def choose_schema_file(self):
+        """选择组地址表文件(CSV或ETS导出的CSV/XML)"""
+        filename = filedialog.askopenfilename(
+            title="加载组地址表",
+            filetypes=[("组地址表", "*.csv *.xml"), ("所有文件", "*.*")]
+        )
+        if filename:
+            self.load_schema(filename)
+
+    def load_schema(self, filename):
+        """加载组地址表，每个组地址的DPT只在这里解析一次"""
+        try:
+            self.schema = GroupAddressSchema.load(filename)
+        except Exception as e:
+            self.log_message(f"错误: 无法加载组地址表 {filename}: {str(e)}")
+            return
+        self.log_message(f"已加载组地址表 {os.path.basename(filename)}: {len(self.schema)} 个组地址")
+        self.update_dpt_label()
+
+    def update_dpt_label(self):
+        """显示当前组地址的名称和DPT"""
+        entry = self.schema.get(self.group_var.get().strip())
+        if entry is None:
+            self.dpt_label.config(text="")
+        else:
+            self.dpt_label.config(text=f"{entry.name} DPT {entry.dpt}".strip())
 
-        # 创建新的事件循环
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        loop.run_until_complete(send())
-        loop.close()
+    def on_closing(self):
+        """窗口关闭时断开所有连接"""
+        self.client.stop()
+        self.log_sink.close()
+        self.root.destroy()
 
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = KNXControllerApp(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
\ No newline at end of file
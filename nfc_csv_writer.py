@@ -0,0 +1,135 @@
+import csv
+import io
+import logging
+import os
+import queue
+import threading
+import time
+
+# 缓冲多少行后立即写盘
+DEFAULT_FLUSH_ROWS = 100
+# 最长多久写一次盘(秒)，即崩溃时最多丢失这段时间内的记录
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+_STOP = object()
+
+logger = logging.getLogger("CSVRecorder")
+
+
+class CSVRecorder:
+    """在后台线程中批量写入CSV
+
+    write()只把行放入队列，写盘线程攒够flush_rows行或距上次写盘超过flush_interval秒时
+    把整批行一次性写入并flush，fsync=True时再调用os.fsync，界面线程不会被磁盘I/O阻塞。
+    写入出错时在写盘线程中调用on_error(错误信息)；每批写盘后调用after_flush(这批行, 文件长度)；
+    文件关闭后调用after_close()，close()等待超时时由写盘线程在最后一批写盘后调用。
+    """
+
+    def __init__(self, filename, encoding="utf-8", header=None, flush_rows=DEFAULT_FLUSH_ROWS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, fsync=False, on_error=None, after_flush=None,
+                 after_close=None):
+        self.filename = filename
+        self.encoding = encoding
+        self.header = header
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.on_error = on_error
+        self.after_flush = after_flush
+        self.after_close = after_close
+        self.rows_written = 0
+        self._queue = queue.Queue()
+        self._file = None
+        self._thread = None
+        self._close_lock = threading.Lock()
+        self._writer_done = False  # 写盘线程已写完最后一批
+        self._close_in_thread = False  # close()等待超时，由写盘线程自己关闭文件
+
+    def open(self):
+        """打开文件(文件为空时写入标题)并启动写盘线程，打开失败时抛出异常"""
+        self._file = open(self.filename, "a", newline="", encoding=self.encoding)
+        if self.header and self._file.tell() == 0:
+            csv.writer(self._file).writerow(self.header)
+            self._file.flush()
+        self._writer_done = False
+        self._close_in_thread = False
+        self._thread = threading.Thread(target=self._run, name="CSVRecorder", daemon=True)
+        self._thread.start()
+
+    def write(self, row):
+        """提交一行，立即返回"""
+        self._queue.put(row)
+
+    def close(self, timeout=5.0):
+        """写入剩余的行并关闭文件"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        with self._close_lock:
+            if self._thread.is_alive() and not self._writer_done:
+                # 磁盘慢或最后一批很大，不能在写盘线程还在写时关闭文件
+                logger.warning(f"{self.filename} 在{timeout}秒内未写完，写完后由写盘线程关闭文件")
+                self._close_in_thread = True
+            else:
+                self._close_file()
+        self._thread = None
+
+    def _close_file(self):
+        try:
+            self._file.close()
+        finally:
+            self._file = None
+            if self.after_close is not None:
+                self.after_close()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                row = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                row = None
+            if row is _STOP:
+                self._flush(batch)
+                with self._close_lock:
+                    self._writer_done = True
+                    if self._close_in_thread:
+                        self._close_file()
+                return
+            if row is not None:
+                batch.append(row)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+            if batch and (len(batch) >= self.flush_rows or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        # 整批行先格式化，再一次写入，减少写了一半的行
+        text = io.StringIO()
+        csv.writer(text).writerows(batch)
+        try:
+            self._file.write(text.getvalue())
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.rows_written += len(batch)
+            size = os.fstat(self._file.fileno()).st_size
+        except (OSError, UnicodeError) as e:
+            if self.on_error is not None:
+                self.on_error(f"写入 {self.filename} 失败: {e}")
+            return
+        if self.after_flush is not None:
+            try:
+                self.after_flush(batch, size)
+            except Exception as e:
+                # 回调出错不能结束写盘线程，否则文件不会被关闭
+                logger.exception(f"{self.filename} 写盘后的回调出错")
+                if self.on_error is not None:
+                    self.on_error(f"{self.filename} 写盘后的回调出错: {e}")
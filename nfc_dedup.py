@@ -0,0 +1,108 @@
+import csv
+import io
+import logging
+import os
+import re
+import struct
+
+logger = logging.getLogger("NFCDedup")
+
+# 索引文件头: 魔数, 索引已覆盖的CSV字节数；之后每张卡4字节
+HEADER = struct.Struct("<8sQ")
+MAGIC = b"NFCIDX\x00\x01"
+CARD_ID_SIZE = 4
+CARD_ID_PATTERN = re.compile(r"[0-9A-Fa-f]{8}")
+# 卡号在CSV中的列
+CARD_ID_COLUMN = 3
+
+
+def index_filename(csv_filename):
+    return csv_filename + ".idx"
+
+
+class CardIndex:
+    """CSV记录文件的卡号索引
+
+    与CSV放在一起的二进制文件(<CSV>.idx)，记录CSV中已有的卡号和它覆盖到的CSV长度。
+    启动时只读索引；CSV比索引记录的更长时只流式读取新增的部分，索引缺失或损坏、
+    CSV被截短时才流式重建。之后每次CSV写盘后追加新卡号。
+    """
+
+    def __init__(self, csv_filename, encoding="utf-8"):
+        self.csv_filename = csv_filename
+        self.filename = index_filename(csv_filename)
+        self.encoding = encoding
+        self._file = None
+
+    def load(self):
+        """打开(必要时更新或重建)索引，返回CSV中已有卡号的集合"""
+        csv_size = os.path.getsize(self.csv_filename) if os.path.exists(self.csv_filename) else 0
+        covered, records = self._read_index()
+        if covered is None or covered > csv_size:
+            if covered is not None:
+                logger.warning(f"{self.csv_filename} 比索引记录的短，重建索引")
+            covered, records = 0, b""
+            self._file = open(self.filename, "w+b")
+            self._file.write(HEADER.pack(MAGIC, 0))
+        else:
+            self._file = open(self.filename, "r+b")
+            self._file.truncate(HEADER.size + len(records))
+
+        if covered < csv_size:
+            # 索引之后CSV又写入了数据(或索引是新建的)，只读取新增的部分
+            new_records = self._scan_csv(covered)
+            self._append(new_records, csv_size)
+            records += new_records
+
+        hex_ids = records.hex().upper()
+        step = CARD_ID_SIZE * 2
+        return {hex_ids[i:i + step] for i in range(0, len(hex_ids), step)}
+
+    def _read_index(self):
+        """返回(覆盖的CSV字节数, 卡号记录)，索引不存在或无效时覆盖字节数为None"""
+        try:
+            with open(self.filename, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None, b""
+        if len(data) < HEADER.size:
+            return None, b""
+        magic, covered = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            logger.warning(f"{self.filename} 不是有效的卡号索引，重建索引")
+            return None, b""
+        records = data[HEADER.size:]
+        # 忽略崩溃时写了一半的记录
+        return covered, records[:len(records) - len(records) % CARD_ID_SIZE]
+
+    def _scan_csv(self, offset):
+        """从offset开始流式读取CSV，返回其中卡号的原始字节"""
+        records = bytearray()
+        with open(self.csv_filename, "rb") as raw:
+            raw.seek(offset)
+            text = io.TextIOWrapper(raw, encoding=self.encoding, errors="replace", newline="")
+            for row in csv.reader(text):
+                if len(row) > CARD_ID_COLUMN and CARD_ID_PATTERN.fullmatch(row[CARD_ID_COLUMN]):
+                    records += bytes.fromhex(row[CARD_ID_COLUMN])
+        return bytes(records)
+
+    def _append(self, records, csv_size):
+        # 先追加记录再更新文件头，崩溃时最多重新扫描一次CSV的尾部
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(records)
+        self._file.seek(0)
+        self._file.write(HEADER.pack(MAGIC, csv_size))
+        self._file.flush()
+
+    def append_rows(self, rows, csv_size):
+        """CSV写盘后调用，把这批行的卡号追加到索引，csv_size为写入后的CSV长度"""
+        records = b"".join(
+            bytes.fromhex(row[CARD_ID_COLUMN]) for row in rows
+            if CARD_ID_PATTERN.fullmatch(str(row[CARD_ID_COLUMN]))
+        )
+        self._append(records, csv_size)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
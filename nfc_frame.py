@@ -0,0 +1,116 @@
+"""NFC读卡器串口数据帧解析
+
+读卡器每刷一次卡发送一帧: 4字节卡号 + b'\\r\\n'。
+"""
+
+FRAME_TERMINATOR = b"\r\n"
+CARD_ID_LENGTH = 4
+FRAME_LENGTH = CARD_ID_LENGTH + len(FRAME_TERMINATOR)
+
+# 分隔模式：按\r\n切分，长度不是4字节的帧报告为错误(旧的解析方式)
+MODE_DELIMITED = "delimited"
+# 定长模式：每帧固定4字节卡号+\r\n，卡号本身可以包含0x0D 0x0A；
+# 帧尾不匹配时逐字节滑动重新同步
+MODE_FIXED = "fixed"
+
+DEFAULT_BUFFER_SIZE = 4096
+
+
+class NFCFrameParser:
+    """增量帧解析器
+
+    数据写入一个可复用的缓冲区，用偏移量记录解析位置，每个字节只扫描一次；
+    只有缓冲区写满时才把未处理的数据移到开头。
+    """
+
+    def __init__(self, mode=MODE_FIXED, buffer_size=DEFAULT_BUFFER_SIZE):
+        if mode not in (MODE_FIXED, MODE_DELIMITED):
+            raise ValueError(f"未知的解析模式: {mode}")
+        self.mode = mode
+        self._buffer = bytearray(max(buffer_size, FRAME_LENGTH))
+        self._start = 0  # 第一个未处理字节
+        self._end = 0  # 已写入数据的末尾
+        self._scan = 0  # 分隔模式下下一次查找\r\n的起点
+        self._discarded = 0  # 定长模式下当前连续丢弃的字节数
+        self.frames = 0
+        self.errors = 0
+        self.compactions = 0
+
+    @property
+    def pending(self):
+        """缓冲区中尚未组成完整帧的字节数"""
+        return self._end - self._start
+
+    def _append(self, data):
+        size = len(data)
+        if self._end + size > len(self._buffer):
+            pending = self._end - self._start
+            if pending + size > len(self._buffer):
+                # 空间不够时扩容(只在异常的超长数据时发生)
+                self._buffer.extend(bytes(pending + size - len(self._buffer)))
+            # 把未处理的数据移到开头
+            self._buffer[:pending] = self._buffer[self._start:self._end]
+            self._scan -= self._start
+            self._start = 0
+            self._end = pending
+            self.compactions += 1
+        self._buffer[self._end:self._end + size] = data
+        self._end += size
+
+    def feed(self, data):
+        """写入新收到的数据，返回解析出的[(卡号, 错误信息)]，卡号和错误信息只有一个不为None"""
+        if data:
+            self._append(data)
+        if self.mode == MODE_FIXED:
+            results = self._parse_fixed()
+        else:
+            results = self._parse_delimited()
+        if self._start == self._end:
+            # 缓冲区已空，直接从头开始写，避免移动数据
+            self._scan -= self._start
+            self._start = self._end = 0
+        return results
+
+    def _parse_fixed(self):
+        results = []
+        buffer = self._buffer
+        start = self._start
+        end = self._end
+        while end - start >= FRAME_LENGTH:
+            terminator = start + CARD_ID_LENGTH
+            if buffer[terminator] == 0x0D and buffer[terminator + 1] == 0x0A:
+                if self._discarded:
+                    results.append((None, f"丢弃 {self._discarded} 字节无效数据"))
+                    self.errors += 1
+                    self._discarded = 0
+                results.append((buffer[start:terminator].hex().upper(), None))
+                self.frames += 1
+                start += FRAME_LENGTH
+            else:
+                # 帧尾不匹配，滑动一个字节重新同步
+                self._discarded += 1
+                start += 1
+        self._start = start
+        return results
+
+    def _parse_delimited(self):
+        results = []
+        buffer = self._buffer
+        start = self._start
+        scan = max(self._scan, start)
+        while True:
+            index = buffer.find(FRAME_TERMINATOR, scan, self._end)
+            if index < 0:
+                # \r可能是下一个\r\n的前半部分
+                self._scan = max(start, self._end - 1)
+                break
+            length = index - start
+            if length == CARD_ID_LENGTH:
+                results.append((buffer[start:index].hex().upper(), None))
+                self.frames += 1
+            else:
+                results.append((None, f"无效数据长度: {length}字节"))
+                self.errors += 1
+            start = scan = index + len(FRAME_TERMINATOR)
+        self._start = start
+        return results
@@ -0,0 +1,47 @@
+import collections
+import csv
+import os
+import tempfile
+
+from nfc_csv_writer import CSVRecorder
+
+# 一次搜索最多显示多少条结果(取最新的)
+DEFAULT_SEARCH_LIMIT = 1000
+
+
+class SessionHistory:
+    """本次运行显示过的所有行
+
+    由CSVRecorder在后台写入临时文件，内存中不保存历史；搜索时流式读取该文件。
+    最近flush_interval秒内的行可能还没写盘，暂时搜索不到。
+    """
+
+    def __init__(self, flush_interval=1.0):
+        fd, self.filename = tempfile.mkstemp(prefix="nfc_session_", suffix=".csv")
+        os.close(fd)
+        self._recorder = CSVRecorder(self.filename, encoding="utf-8", flush_interval=flush_interval)
+        self._recorder.open()
+        self.count = 0
+
+    def append(self, values):
+        self._recorder.write(list(values))
+        self.count += 1
+
+    def search(self, text, limit=DEFAULT_SEARCH_LIMIT):
+        """返回(匹配总数, 最新的limit条匹配行)，任一列包含text(不区分大小写)即匹配"""
+        text = text.strip().lower()
+        matches = collections.deque(maxlen=limit)
+        total = 0
+        with open(self.filename, newline="", encoding="utf-8", errors="replace") as f:
+            for row in csv.reader(f):
+                if any(text in cell.lower() for cell in row):
+                    matches.append(row)
+                    total += 1
+        return total, list(matches)
+
+    def close(self):
+        self._recorder.close()
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
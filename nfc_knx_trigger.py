@@ -0,0 +1,133 @@
+import collections
+import csv
+import logging
+import time
+
+from xknx.telegram import Telegram
+
+from knx_client import KNXClient, build_telegram, parse_value
+from knx_connection import DEFAULT_GATEWAY_PORT
+from knx_metrics import percentile
+
+logger = logging.getLogger("NFCKNXTrigger")
+
+DEFAULT_RULES_FILE = "nfc_knx_rules.csv"
+# 规则中匹配任意卡号或任意权限
+ANY = "*"
+# 统计最近多少次刷卡的延迟
+LATENCY_SAMPLES = 1000
+
+
+class TriggerRules:
+    """刷卡触发规则
+
+    规则文件每行: 卡号,权限,组地址,DPT,值；卡号或权限为*表示任意。
+    加载时就把每条规则编码为(组地址, GroupValueWrite)，刷卡时只查字典。
+    按以下顺序取第一个有规则的匹配: 卡号+权限、卡号、权限、任意。
+    """
+
+    def __init__(self, rules=()):
+        self._by_card = collections.defaultdict(list)  # (卡号, 权限或ANY) -> [(组地址, payload)]
+        self._by_permission = collections.defaultdict(list)  # 权限 -> [(组地址, payload)]
+        self._default = []
+        for card_id, permission, group_address, dpt, value in rules:
+            self.add(card_id, permission, group_address, dpt, value)
+
+    def __len__(self):
+        return (sum(map(len, self._by_card.values())) + sum(map(len, self._by_permission.values()))
+                + len(self._default))
+
+    def add(self, card_id, permission, group_address, dpt, value):
+        telegram = build_telegram(group_address, value, dpt)
+        action = (telegram.destination_address, telegram.payload)
+        card_id = str(card_id).upper()
+        permission = ANY if str(permission) == ANY else int(permission)
+        if card_id != ANY:
+            self._by_card[(card_id, permission)].append(action)
+        elif permission != ANY:
+            self._by_permission[permission].append(action)
+        else:
+            self._default.append(action)
+
+    def match(self, card_id, permission):
+        """返回刷卡要发送的[(组地址, payload)]"""
+        return (self._by_card.get((card_id, permission))
+                or self._by_card.get((card_id, ANY))
+                or self._by_permission.get(permission)
+                or self._default)
+
+    @classmethod
+    def load(cls, filename):
+        rules = []
+        with open(filename, newline="", encoding="utf-8-sig") as f:
+            for line_number, row in enumerate(csv.reader(f), start=1):
+                row = [field.strip() for field in row]
+                if not row or not row[0] or row[0].startswith("#"):
+                    continue
+                if line_number == 1 and row[0] in ("card_id", "卡号"):
+                    continue  # 标题行
+                if len(row) < 5:
+                    raise ValueError(f"{filename} 第{line_number}行应为: 卡号,权限,组地址,DPT,值")
+                rules.append((row[0], row[1], row[2], row[3], parse_value(row[4])))
+        return cls(rules)
+
+
+class KNXTrigger:
+    """把刷卡事件转换为KNX组地址写入
+
+    启动时就建立隧道，刷卡时在读取线程中查规则表并把报文提交到KNXClient的事件循环，
+    不需要为每次刷卡建立连接。
+    """
+
+    def __init__(self, rules, gateway_ip, gateway_port=DEFAULT_GATEWAY_PORT, local_ip=None,
+                 client=None, on_error=None):
+        self.rules = rules
+        self.gateway = (gateway_ip, gateway_port, local_ip)
+        self.client = client or KNXClient(local_ip=local_ip)
+        self.on_error = on_error
+        self.swipes = 0
+        self.telegrams_sent = 0
+        self.errors = 0
+        self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+
+    def start(self):
+        """在后台建立隧道，返回concurrent.futures.Future"""
+        return self.client.submit(self.client.connect(*self.gateway))
+
+    def stop(self):
+        self.client.stop()
+
+    def handle_swipe(self, card_id, permission):
+        """处理一次刷卡，可在任意线程中调用，立即返回；没有匹配的规则时返回False"""
+        actions = self.rules.match(card_id, permission)
+        if not actions:
+            return False
+        self.swipes += 1
+        self.client.submit(self._send(card_id, actions, time.perf_counter()))
+        return True
+
+    async def _send(self, card_id, actions, swipe_time):
+        for group_address, payload in actions:
+            try:
+                await self.client.send_telegram(
+                    Telegram(destination_address=group_address, payload=payload),
+                    *self.gateway
+                )
+                self.telegrams_sent += 1
+            except Exception as e:
+                self.errors += 1
+                message = f"卡号 {card_id} 写入 {group_address} 失败: {e}"
+                logger.error(message)
+                if self.on_error is not None:
+                    self.on_error(message)
+        # 从刷卡到最后一条报文确认的耗时
+        self.latencies.append(time.perf_counter() - swipe_time)
+
+    def stats(self):
+        ms = sorted(latency * 1000 for latency in self.latencies)
+        return {
+            "swipes": self.swipes,
+            "telegrams_sent": self.telegrams_sent,
+            "errors": self.errors,
+            "latency_ms": {"p50": round(percentile(ms, 0.5), 2), "p99": round(percentile(ms, 0.99), 2)},
+        }
@@ -0,0 +1,57 @@
+import collections
+import tkinter as tk
+from tkinter import ttk
+
+# 汇总通知的时间窗口(秒)
+DEFAULT_NOTIFY_INTERVAL = 5.0
+
+
+class NotificationBar:
+    """非模态的错误通知栏
+
+    同一时间窗口内的通知按类别计数，窗口开始时的第一条立即显示，之后每个窗口最多刷新一次，
+    如"最近5秒: 重复卡号 12 次(最后: ...)"。只能在Tk主线程中调用，不会阻塞事件循环。
+    """
+
+    def __init__(self, root, interval=DEFAULT_NOTIFY_INTERVAL):
+        self.root = root
+        self.interval = interval
+        self.text_var = tk.StringVar()
+        self.label = ttk.Label(root, textvariable=self.text_var, foreground="red", anchor="w")
+        self.totals = collections.Counter()  # 各类别的累计次数
+        self._counts = collections.Counter()  # 当前窗口内尚未显示的次数
+        self._last = {}  # 各类别最近一条通知
+        self._timer = None
+
+    def report(self, kind, message):
+        self.totals[kind] += 1
+        self._counts[kind] += 1
+        self._last[kind] = message
+        if self._timer is None:
+            self._show(first=True)
+            self._timer = self.root.after(int(self.interval * 1000), self._tick)
+
+    def _tick(self):
+        if self._counts:
+            self._show(first=False)
+            self._timer = self.root.after(int(self.interval * 1000), self._tick)
+        else:
+            # 一个窗口内没有新通知，清除显示
+            self._timer = None
+            self.text_var.set("")
+
+    def _show(self, first):
+        parts = []
+        for kind, count in self._counts.items():
+            if first and count == 1:
+                parts.append(f"{kind}: {self._last[kind]}")
+            else:
+                parts.append(f"{kind} {count} 次(最后: {self._last[kind]})")
+        prefix = "" if first else f"最近{self.interval:g}秒: "
+        self.text_var.set(prefix + "；".join(parts))
+        self._counts.clear()
+
+    def cancel(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
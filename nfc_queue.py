@@ -0,0 +1,126 @@
+import collections
+import os
+import pickle
+import queue
+import tempfile
+import threading
+import time
+
+# 队列满时的处理方式
+POLICY_BLOCK = "block"  # 阻塞读取线程，直到界面取走数据(最多block_timeout秒，超时后丢弃新数据)
+POLICY_DROP_OLDEST = "drop_oldest"  # 丢弃最旧的数据
+POLICY_SPILL = "spill"  # 写入临时文件，内存中的数据取完后再按顺序读回
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BLOCK_TIMEOUT = 5.0
+
+
+class BoundedEventQueue:
+    """读取线程和界面线程之间的有界队列
+
+    与queue.Queue一样使用put()/get_nowait()/qsize()，内存中最多保存maxsize条数据，
+    满时按policy处理。depth、dropped、spilled、high_water可用于监控。
+    """
+
+    def __init__(self, maxsize=DEFAULT_QUEUE_SIZE, policy=POLICY_BLOCK,
+                 block_timeout=DEFAULT_BLOCK_TIMEOUT):
+        if policy not in (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_SPILL):
+            raise ValueError(f"未知的队列策略: {policy}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0  # 因队列满而丢弃的数据
+        self.spilled = 0  # 写入过临时文件的数据
+        self.high_water = 0  # 最大深度
+        self._items = collections.deque()
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._spill_file = None
+        self._spill_read = 0  # 临时文件中下一条未读数据的位置
+        self._spill_count = 0  # 临时文件中未读的数据条数
+
+    @property
+    def depth(self):
+        """尚未取走的数据条数(包括临时文件中的)"""
+        with self._lock:
+            return len(self._items) + self._spill_count
+
+    def qsize(self):
+        return self.depth
+
+    def put(self, item, block=True):
+        """放入一条数据，因队列满而丢弃时返回False
+
+        block=False时即使策略为block也不等待，队列满就直接丢弃(计入dropped)，
+        用于不能被阻塞的线程(如asyncio事件循环)。
+        """
+        with self._lock:
+            if self._spill_count:
+                # 已有数据在临时文件中，后来的也写入文件以保持顺序
+                self._spill(item)
+            elif len(self._items) < self.maxsize:
+                self._items.append(item)
+            elif self.policy == POLICY_DROP_OLDEST:
+                self._items.popleft()
+                self._items.append(item)
+                self.dropped += 1
+            elif self.policy == POLICY_SPILL:
+                self._spill(item)
+            elif not block:
+                self.dropped += 1
+                return False
+            else:
+                deadline = time.monotonic() + self.block_timeout
+                while len(self._items) >= self.maxsize:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.dropped += 1
+                        return False
+                    self._not_full.wait(remaining)
+                self._items.append(item)
+            depth = len(self._items) + self._spill_count
+            if depth > self.high_water:
+                self.high_water = depth
+            return True
+
+    def put_nowait(self, item):
+        return self.put(item, block=False)
+
+    def get_nowait(self):
+        with self._lock:
+            if not self._items and self._spill_count:
+                self._unspill()
+            if not self._items:
+                raise queue.Empty
+            item = self._items.popleft()
+            self._not_full.notify()
+            return item
+
+    def _spill(self, item):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(prefix="nfc_queue_")
+        self._spill_file.seek(0, os.SEEK_END)
+        pickle.dump(item, self._spill_file, pickle.HIGHEST_PROTOCOL)
+        self._spill_count += 1
+        self.spilled += 1
+
+    def _unspill(self):
+        """从临时文件读回最多maxsize条数据"""
+        self._spill_file.seek(self._spill_read)
+        while self._spill_count and len(self._items) < self.maxsize:
+            self._items.append(pickle.load(self._spill_file))
+            self._spill_count -= 1
+        self._spill_read = self._spill_file.tell()
+        if not self._spill_count:
+            # 全部读回后清空文件，避免无限增长
+            self._spill_file.seek(0)
+            self._spill_file.truncate()
+            self._spill_read = 0
+
+    def close(self):
+        with self._lock:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+                self._spill_count = 0
+                self._spill_read = 0
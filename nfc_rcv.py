@@ -1,33 +1,80 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import serial
 import serial.tools.list_ports
-import csv
+import argparse
+import collections
 from datetime import datetime
 import threading
 import queue
-import time
+import sqlite3
+
+from nfc_csv_writer import DEFAULT_FLUSH_INTERVAL, DEFAULT_FLUSH_ROWS, CSVRecorder
+from nfc_dedup import CardIndex
+from nfc_frame import MODE_DELIMITED, MODE_FIXED
+from nfc_history import SessionHistory
+from nfc_notify import NotificationBar
+from nfc_queue import (DEFAULT_QUEUE_SIZE, POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_SPILL,
+                       BoundedEventQueue)
+from nfc_readers import READ_MODE_BLOCKING, READ_MODE_POLLING, SerialReaderPool
+from nfc_registry import DEFAULT_REGISTRY_FILE, CardRegistry
+
+# 表格中最多保留多少行，更早的行只保存在会话历史文件中，可通过搜索查看
+MAX_TABLE_ROWS = 500
+# 界面线程检查其他线程通知的间隔(毫秒)；轮询模式下每隔POLL_INTERVAL毫秒处理一次数据队列
+UI_WAKEUP_INTERVAL = 10
+POLL_INTERVAL = 100
 
 
 class NFCReaderApp:
-    def __init__(self, root):
+    def __init__(self, root, read_mode=READ_MODE_BLOCKING, frame_mode=MODE_FIXED,
+                 csv_flush_rows=DEFAULT_FLUSH_ROWS, csv_flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 csv_fsync=False, registry_file=DEFAULT_REGISTRY_FILE, max_table_rows=MAX_TABLE_ROWS,
+                 queue_size=DEFAULT_QUEUE_SIZE, queue_policy=POLICY_BLOCK, knx_trigger=None):
         self.root = root
         self.root.title("NFC卡号读取器")
         self.root.geometry("900x550")
 
-        self.serial_port = None
-        self.csv_file = None
-        self.csv_writer = None
-        self.data_queue = queue.Queue()
+        self.csv_recorder = None
+        self.card_index = None
+        self.recorded_card_ids = set()  # 正在记录的CSV文件中已有的卡号，跨连接和重启保留
+        # CSV每攒够csv_flush_rows行或每隔csv_flush_interval秒写一次盘，崩溃时最多丢失这些记录
+        self.csv_flush_rows = csv_flush_rows
+        self.csv_flush_interval = csv_flush_interval
+        self.csv_fsync = csv_fsync  # 每次写盘后fsync，断电也不丢已写入的行
+        # 有界队列，界面卡住时按queue_policy阻塞读取线程、丢弃最旧数据或暂存到磁盘，内存占用不会无限增长
+        self.data_queue = BoundedEventQueue(queue_size, queue_policy)
+        self.reported_drops = 0
         self.current_permission = 0  # 默认权限等级为0
-        self.running = True  # 控制读取线程的运行状态
         self.seen_card_ids = set()  # 用于存储已见过的卡号
+        self.card_registry = CardRegistry(registry_file)  # 卡号 -> 员工姓名、员工号和权限
+        self.max_table_rows = max_table_rows
+        self.table_items = collections.deque()  # 表格中各行的item id，最旧的在前
+        self.recent_rows = collections.deque(maxlen=max_table_rows)  # 最近的行，退出搜索时恢复表格
+        self.session_history = SessionHistory()
+        self.search_active = False  # 表格正在显示搜索结果
+        self.knx_trigger = knx_trigger  # 刷卡触发KNX写入，见nfc_knx_trigger
+        self.read_mode = read_mode
+        self.ui_notify_pending = threading.Event()  # 其他线程已放入数据但界面线程尚未处理
+        self.ui_calls = queue.SimpleQueue()  # 其他线程提交、要在界面线程中执行的(函数, 参数)
+        # 所有读卡器共用一个读取池、一个数据队列和一个已见卡号集合
+        self.reader_pool = SerialReaderPool(
+            self.on_frames,
+            self.on_reader_error,
+            self.notify_ui,
+            read_mode=read_mode,
+            frame_mode=frame_mode  # 串口数据的分帧方式，见nfc_frame
+        )
 
         # 创建UI组件
         self.create_widgets()
 
-        # 每100ms检查一次数据队列
-        self.root.after(100, self.process_queue)
+        # 其他线程不调用Tk(跨线程调用会等待界面线程，界面卡住时会阻塞读取线程和KNX事件循环)，
+        # 只设置ui_notify_pending，由界面线程定期检查
+        self.root.after(self.ui_interval, self.process_queue)
+
+    @property
+    def ui_interval(self):
+        return POLL_INTERVAL if self.read_mode == READ_MODE_POLLING else UI_WAKEUP_INTERVAL
 
     def create_widgets(self):
         # 串口配置面板
@@ -35,8 +82,10 @@ class NFCReaderApp:
         config_frame.pack(fill="x", padx=10, pady=5, ipadx=5, ipady=5)
 
         ttk.Label(config_frame, text="串口号:").grid(row=0, column=0, padx=5, pady=5, sticky="e")
-        self.port_combobox = ttk.Combobox(config_frame, width=15)
-        self.port_combobox.grid(row=0, column=1, padx=5, pady=5)
+        # 可按住Ctrl/Shift同时选择多个读卡器
+        self.port_listbox = tk.Listbox(config_frame, width=18, height=3, selectmode="extended",
+                                       exportselection=False)
+        self.port_listbox.grid(row=0, column=1, padx=5, pady=5)
         self.refresh_ports()
 
         ttk.Label(config_frame, text="波特率:").grid(row=0, column=2, padx=5, pady=5, sticky="e")
@@ -93,12 +142,16 @@ class NFCReaderApp:
         status_bar = ttk.Label(self.root, textvariable=self.status_var, relief="sunken", anchor="w")
         status_bar.pack(fill="x", side="bottom", padx=0, pady=0)
 
+        # 重复卡号和错误通知，不弹出对话框，避免阻塞数据处理
+        self.notifications = NotificationBar(self.root)
+        self.notifications.label.pack(fill="x", side="bottom", padx=10, pady=0)
+
         # 数据显示表格 (根据新要求调整列顺序)
         data_frame = ttk.LabelFrame(self.root, text="读取数据")
         data_frame.pack(fill="both", expand=True, padx=10, pady=5, ipadx=5, ipady=5)
 
-        # 新列顺序: time, employee_name, employee_id, card_id, permission
-        columns = ("time", "employee_name", "employee_id", "card_id", "permission")
+        # 新列顺序: time, employee_name, employee_id, card_id, permission, port
+        columns = ("time", "employee_name", "employee_id", "card_id", "permission", "port")
         self.tree = ttk.Treeview(data_frame, columns=columns, show="headings")
 
         # 设置表头和列宽
@@ -107,12 +160,14 @@ class NFCReaderApp:
         self.tree.heading("employee_id", text="员工号")
         self.tree.heading("card_id", text="卡号")
         self.tree.heading("permission", text="权限等级")
+        self.tree.heading("port", text="读卡器")
 
         self.tree.column("time", width=200)
         self.tree.column("employee_name", width=120)
         self.tree.column("employee_id", width=100)
         self.tree.column("card_id", width=120)
         self.tree.column("permission", width=100)
+        self.tree.column("port", width=100)
 
         # 添加垂直和水平滚动条
         vsb = ttk.Scrollbar(data_frame, orient="vertical", command=self.tree.yview)
@@ -124,6 +179,18 @@ class NFCReaderApp:
         vsb.grid(row=0, column=1, sticky="ns")
         hsb.grid(row=1, column=0, sticky="ew")
 
+        # 搜索本次运行的全部记录
+        search_frame = ttk.Frame(data_frame)
+        search_frame.grid(row=2, column=0, columnspan=2, sticky="ew", pady=(5, 0))
+        ttk.Label(search_frame, text="搜索:").pack(side="left", padx=5)
+        self.search_entry = ttk.Entry(search_frame, width=30)
+        self.search_entry.pack(side="left", padx=5)
+        self.search_entry.bind("<Return>", lambda event: self.search_history())
+        ttk.Button(search_frame, text="搜索", command=self.search_history).pack(side="left", padx=5)
+        ttk.Button(search_frame, text="显示最新", command=self.show_recent).pack(side="left", padx=5)
+        self.queue_var = tk.StringVar(value="队列: 0")
+        ttk.Label(search_frame, textvariable=self.queue_var).pack(side="right", padx=5)
+
         # 配置网格行列权重
         data_frame.grid_rowconfigure(0, weight=1)
         data_frame.grid_columnconfigure(0, weight=1)
@@ -146,68 +213,61 @@ class NFCReaderApp:
     def refresh_ports(self):
         """刷新可用的串口列表"""
         ports = [port.device for port in serial.tools.list_ports.comports()]
-        self.port_combobox["values"] = ports
+        self.port_listbox.delete(0, "end")
+        for port in ports:
+            self.port_listbox.insert("end", port)
         if ports:
-            self.port_combobox.current(0)
+            self.port_listbox.selection_set(0)
 
     def toggle_connection(self):
         """切换串口连接状态"""
-        if self.serial_port and self.serial_port.is_open:
+        if self.reader_pool.running:
             self.close_serial()
-            self.connect_btn.config(text="连接")
-            self.record_btn.config(state="disabled")
-            self.toggle_perm_btn.config(state="disabled")
         else:
             self.open_serial()
-            self.toggle_perm_btn.config(state="normal")
 
     def open_serial(self):
-        """打开串口连接"""
-        port = self.port_combobox.get()
+        """打开选中的所有串口"""
+        ports = [self.port_listbox.get(i) for i in self.port_listbox.curselection()]
         baud_rate = self.baud_entry.get()
 
-        if not port:
+        if not ports:
             messagebox.showerror("错误", "请选择串口号")
             return
 
         try:
-            self.serial_port = serial.Serial(
-                port=port,
-                baudrate=int(baud_rate),
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=1
-            )
-            self.status_var.set(f"已连接 {port}@{baud_rate}")
-            self.connect_btn.config(text="断开")
-            self.record_btn.config(state="normal")
-
-            # 启动读取线程
-            self.running = True
-            self.serial_thread = threading.Thread(target=self.read_serial, daemon=True)
-            self.serial_thread.start()
-        except Exception as e:
+            errors = self.reader_pool.open(ports, int(baud_rate))
+        except ValueError as e:
             messagebox.showerror("连接错误", str(e))
+            return
+        if errors:
+            messagebox.showerror("连接错误", "\n".join(f"{port}: {error}" for port, error in errors.items()))
+        opened = self.reader_pool.ports
+        if not opened:
+            self.reader_pool.close()
+            return
+
+        self.status_var.set(f"已连接 {', '.join(opened)}@{baud_rate}")
+        self.connect_btn.config(text="断开")
+        self.record_btn.config(state="normal")
+        self.toggle_perm_btn.config(state="normal")
 
     def close_serial(self):
-        """关闭串口连接"""
-        if self.serial_port and self.serial_port.is_open:
-            self.running = False  # 通知线程停止
-            if hasattr(self, 'serial_thread') and self.serial_thread.is_alive():
-                self.serial_thread.join(timeout=1.0)  # 等待线程结束
-            self.serial_port.close()
+        """关闭所有串口"""
+        if self.reader_pool.running:
+            self.reader_pool.close()
             self.status_var.set("连接已断开")
+            self.connect_btn.config(text="连接")
             self.record_btn.config(state="disabled")
             self.toggle_perm_btn.config(state="disabled")
-            if self.csv_file:
+            if self.csv_recorder:
                 self.stop_recording()
             # 清空已见过的卡号集合
             self.seen_card_ids.clear()
 
     def toggle_recording(self):
         """切换数据记录状态"""
-        if self.csv_file:
+        if self.csv_recorder:
             self.stop_recording()
             self.record_btn.config(text="开始记录")
         else:
@@ -230,90 +290,131 @@ class NFCReaderApp:
             if encoding == "UTF-8 with BOM":
                 file_encoding = "utf-8-sig"
 
-            self.csv_file = open(filename, "a", newline="", encoding=file_encoding)
-            self.csv_writer = csv.writer(self.csv_file)
-
-            # 如果文件为空，写入标题（按新顺序）
-            if self.csv_file.tell() == 0:
-                self.csv_writer.writerow(["时间戳", "员工姓名", "员工号", "卡号", "权限等级"])
+            # 从索引文件读取CSV中已有的卡号，之后每次写盘时更新索引
+            self.card_index = CardIndex(filename, file_encoding)
+            self.recorded_card_ids = self.card_index.load()
+
+            # 由后台线程批量写盘；如果文件为空，写入标题（按新顺序）
+            self.csv_recorder = CSVRecorder(
+                filename,
+                encoding=file_encoding,
+                header=["时间戳", "员工姓名", "员工号", "卡号", "权限等级"],
+                flush_rows=self.csv_flush_rows,
+                flush_interval=self.csv_flush_interval,
+                fsync=self.csv_fsync,
+                on_error=self.on_recorder_error,
+                after_flush=self.card_index.append_rows,
+                # 索引在CSV文件关闭后才关闭，写盘线程超时仍在写时由它在最后一批之后关闭
+                after_close=self.card_index.close
+            )
+            self.csv_recorder.open()
 
-            self.status_var.set(f"正在记录到: {filename} ({encoding}编码)")
+            self.status_var.set(f"正在记录到: {filename} ({encoding}编码，已有{len(self.recorded_card_ids)}张卡)")
         except Exception as e:
             messagebox.showerror("文件错误", str(e))
-            self.csv_file = None
-            self.csv_writer = None
+            self.csv_recorder = None
+            if self.card_index:
+                self.card_index.close()
+                self.card_index = None
+            self.recorded_card_ids = set()
 
     def stop_recording(self):
         """停止记录并关闭文件"""
-        if self.csv_file:
+        if self.csv_recorder:
             try:
-                self.csv_file.close()
+                # 等待剩余的行写入
+                self.csv_recorder.close()
                 self.status_var.set("记录已停止")
             except Exception as e:
                 messagebox.showerror("错误", f"关闭文件时出错: {str(e)}")
             finally:
-                self.csv_file = None
-                self.csv_writer = None
+                # 索引由CSVRecorder在文件关闭后关闭
+                self.csv_recorder = None
+                self.card_index = None
+                self.recorded_card_ids = set()
+
+    def on_recorder_error(self, message):
+        """写盘线程出错时调用"""
+        self.data_queue.put(("ERROR", "", "", message, "", ""))
+        self.notify_ui()
+
+    def on_frames(self, port, frames):
+        """读取线程解析出帧后调用，把数据放入队列"""
+        # 同一次读到的帧使用同一时间戳
+        timestamp = datetime.now().strftime("%Y/%m/%d %H:%M")
+        for card_id, error in frames:
+            if card_id is not None:
+                # 按登记表补全员工信息，登记了权限的卡使用登记的权限
+                try:
+                    info = self.card_registry.lookup(card_id)
+                except sqlite3.Error as e:
+                    self.data_queue.put(("ERROR", "", "", f"查询登记表失败: {e}", "", port))
+                    info = None
+                if info is None:
+                    employee_name, employee_id, permission = "", "", self.current_permission
+                else:
+                    employee_name, employee_id = info.employee_name, info.employee_id
+                    permission = self.current_permission if info.permission is None else info.permission
+                # 在读取线程中直接触发KNX写入，不等界面处理
+                if self.knx_trigger is not None:
+                    self.knx_trigger.handle_swipe(card_id, permission)
+                # 通过队列安全地传递数据给主线程
+                self.data_queue.put((timestamp, employee_name, employee_id, card_id, permission, port))
+            else:
+                # 帧格式错误，可能是错误数据
+                self.data_queue.put(("ERROR", "", "", error, "", port))
+
+    def on_trigger_error(self, message):
+        """KNX触发写入失败时在KNX事件循环线程中调用，不能阻塞事件循环: 队列满时丢弃(计入丢弃数)，
+        也不调用Tk，只设置通知标志"""
+        self.data_queue.put_nowait(("ERROR", "", "", message, "", "KNX"))
+        self.notify_ui()
+
+    def on_reader_error(self, port, message):
+        """某个读卡器出错并已关闭，全部读卡器都出错时断开连接"""
+        self.data_queue.put(("ERROR", "", "", message, "", port))
+        if not self.reader_pool.ports:
+            self.call_in_ui(self.close_serial)
+
+    def notify_ui(self):
+        """通知界面线程处理队列，可在任意线程中调用，不调用Tk，立即返回"""
+        self.ui_notify_pending.set()
+
+    def call_in_ui(self, func, *args):
+        """在界面线程中执行func(*args)，可在任意线程中调用，立即返回(代替跨线程的root.after)"""
+        self.ui_calls.put((func, args))
+        self.notify_ui()
 
-    def read_serial(self):
-        """从串口读取数据的线程函数"""
-        buffer = bytearray()
+    def process_queue(self):
+        """在界面线程中定期运行: 有通知时(轮询模式下每次)处理从其他线程接收到的数据"""
         try:
-            while self.running and self.serial_port and self.serial_port.is_open:
-                # 读取串口数据
-                if self.serial_port.in_waiting > 0:
-                    data = self.serial_port.read(self.serial_port.in_waiting)
-                    buffer.extend(data)
-                    
-                    # 检查是否有完整的数据包（4字节卡号 + \r\n）
-                    while b'\r\n' in buffer:
-                        # 找到第一个回车换行符的位置
-                        end_index = buffer.index(b'\r\n')
-                        
-                        # 提取卡号数据（应该是4字节）
-                        card_bytes = buffer[:end_index]
-                        
-                        # 移除已处理的数据
-                        buffer = buffer[end_index+2:]
-                        
-                        # 检查卡号长度
-                        if len(card_bytes) == 4:
-                            # 将4字节转换为16进制字符串
-                            card_id = "".join(f"{b:02X}" for b in card_bytes)
-
-                            # 获取当前时间
-                            timestamp = datetime.now().strftime("%Y/%m/%d %H:%M")
-
-                            # 通过队列安全地传递数据给主线程
-                            self.data_queue.put((timestamp, "", "", card_id, self.current_permission))
-                        else:
-                            # 长度不是4字节，可能是错误数据
-                            self.data_queue.put(("ERROR", "", "", f"无效数据长度: {len(card_bytes)}字节", ""))
-                
-                # 短暂休眠，避免过度占用CPU
-                time.sleep(0.01)
-                
-        except serial.SerialException as e:
-            if self.serial_port and self.serial_port.is_open:
-                self.data_queue.put(("ERROR", "", "", f"串口错误: {str(e)}", ""))
-            self.close_serial()
-        except Exception as e:
-            self.data_queue.put(("ERROR", "", "", f"未知错误: {str(e)}", ""))
+            if self.read_mode == READ_MODE_POLLING or self.ui_notify_pending.is_set():
+                self.drain_queue()
+        finally:
+            self.root.after(self.ui_interval, self.process_queue)
 
-    def process_queue(self):
+    def drain_queue(self):
         """处理从串口线程接收到的数据"""
+        self.ui_notify_pending.clear()
+        while True:
+            try:
+                func, args = self.ui_calls.get_nowait()
+            except queue.Empty:
+                break
+            func(*args)
+        added = False
         try:
             while True:
                 data = self.data_queue.get_nowait()
                 if data[0] == "ERROR":
-                    messagebox.showerror("错误", data[3])
+                    self.notifications.report("错误", f"{data[5]}: {data[3]}" if data[5] else data[3])
                 else:
-                    timestamp, employee_name, employee_id, card_id, permission = data
+                    timestamp, employee_name, employee_id, card_id, permission, port = data
                     
                     # 检查卡号是否重复
-                    if card_id in self.seen_card_ids:
+                    if card_id in self.seen_card_ids or card_id in self.recorded_card_ids:
                         # 卡号重复，显示错误信息
-                        messagebox.showerror("重复卡号", f"卡号 {card_id} 已存在，未添加到列表中")
+                        self.notifications.report("重复卡号", f"{card_id} ({port})")
                         self.status_var.set(f"检测到重复卡号: {card_id}")
                     else:
                         # 卡号未重复，添加到已见集合
@@ -323,34 +424,146 @@ class NFCReaderApp:
                         perm_text = f"{permission} ({'高级' if permission == 1 else '普通'})"
 
                         # 添加到表格显示（使用新列顺序）
-                        self.tree.insert("", "end", values=(timestamp, employee_name, employee_id, card_id, perm_text))
-
-                        # 滚动到底部
-                        self.tree.yview_moveto(1)
+                        self.add_row((timestamp, employee_name, employee_id, card_id, perm_text, port))
+                        added = True
 
                         # 如果正在记录，写入CSV文件（权限只存储数字，不存储文本描述）
-                        if self.csv_writer:
-                            self.csv_writer.writerow([timestamp, employee_name, employee_id, card_id, permission])
+                        if self.csv_recorder:
+                            self.csv_recorder.write([timestamp, employee_name, employee_id, card_id, permission])
                         
                         # 更新状态栏
-                        self.status_var.set(f"已添加卡号: {card_id}")
+                        self.status_var.set(f"已添加卡号: {card_id} ({port})")
         except queue.Empty:
             pass
-        finally:
-            self.root.after(100, self.process_queue)
+        if added and not self.search_active:
+            # 每批数据只滚动一次到底部
+            self.tree.yview_moveto(1)
+        self.update_queue_stats()
+
+    def update_queue_stats(self):
+        """显示队列深度，有数据因队列满被丢弃时通知"""
+        data_queue = self.data_queue
+        text = f"队列: {data_queue.depth} (最大 {data_queue.high_water})"
+        if data_queue.spilled:
+            text += f" 暂存: {data_queue.spilled}"
+        if data_queue.dropped:
+            text += f" 丢弃: {data_queue.dropped}"
+        self.queue_var.set(text)
+        if data_queue.dropped > self.reported_drops:
+            self.notifications.report("队列已满", f"丢弃 {data_queue.dropped - self.reported_drops} 条数据")
+            self.reported_drops = data_queue.dropped
+
+    def add_row(self, values):
+        """添加一行，表格只保留最近max_table_rows行，全部行写入会话历史"""
+        self.session_history.append(values)
+        self.recent_rows.append(values)
+        if self.search_active:
+            return
+        self.table_items.append(self.tree.insert("", "end", values=values))
+        if len(self.table_items) > self.max_table_rows:
+            self.tree.delete(self.table_items.popleft())
+
+    def search_history(self):
+        """在后台线程中搜索会话历史，结果显示在表格中"""
+        text = self.search_entry.get().strip()
+        if not text:
+            self.show_recent()
+            return
+        self.status_var.set(f"正在搜索: {text}")
+        threading.Thread(target=self._search_worker, args=(text,), daemon=True).start()
+
+    def _search_worker(self, text):
+        try:
+            total, rows = self.session_history.search(text)
+        except OSError as e:
+            self.call_in_ui(self.status_var.set, f"搜索失败: {e}")
+            return
+        self.call_in_ui(self.show_search_results, text, total, rows)
+
+    def show_search_results(self, text, total, rows):
+        self.search_active = True
+        self._fill_table(rows)
+        shown = f"，显示最近 {len(rows)} 条" if len(rows) < total else ""
+        self.status_var.set(f"搜索 \"{text}\" 找到 {total} 条记录{shown}")
+
+    def show_recent(self):
+        """退出搜索，恢复显示最近的行"""
+        self.search_active = False
+        self._fill_table(self.recent_rows)
+        self.tree.yview_moveto(1)
+        self.status_var.set(f"本次共 {self.session_history.count} 条记录")
+
+    def _fill_table(self, rows):
+        self.tree.delete(*self.table_items)
+        self.table_items = collections.deque(self.tree.insert("", "end", values=values) for values in rows)
 
     def on_closing(self):
         """窗口关闭时的清理操作"""
-        self.running = False  # 通知线程停止
-        if self.serial_port and self.serial_port.is_open:
+        if self.reader_pool.running:
             self.close_serial()
-        if self.csv_file:
+        if self.csv_recorder:
             self.stop_recording()
+        self.card_registry.close()
+        self.session_history.close()
+        self.notifications.cancel()
+        self.data_queue.close()
+        if self.knx_trigger is not None:
+            self.knx_trigger.stop()
         self.root.destroy()
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="NFC卡号读取器")
+    parser.add_argument("--rules", help="刷卡触发KNX写入的规则文件(卡号,权限,组地址,DPT,值)")
+    parser.add_argument("--gateway", help="KNX路由器IP")
+    parser.add_argument("--port", type=int, default=3671, help="KNX路由器端口")
+    parser.add_argument("--local-ip", help="本地IP")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="读取线程和界面之间的队列最多缓存的数据条数")
+    parser.add_argument("--queue-policy", choices=(POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_SPILL),
+                        default=POLICY_BLOCK,
+                        help="队列满时: 阻塞读取线程、丢弃最旧的数据或暂存到临时文件")
+    parser.add_argument("--read-mode", choices=(READ_MODE_BLOCKING, READ_MODE_POLLING),
+                        default=READ_MODE_BLOCKING,
+                        help="串口读取方式: 数据到达时立即唤醒，或每10ms轮询一次")
+    parser.add_argument("--frame-mode", choices=(MODE_FIXED, MODE_DELIMITED), default=MODE_FIXED,
+                        help="分帧方式: 定长4字节卡号+\\r\\n，或按\\r\\n切分(旧的解析方式)")
+    parser.add_argument("--csv-flush-rows", type=int, default=DEFAULT_FLUSH_ROWS,
+                        help="CSV记录攒够多少行后写盘")
+    parser.add_argument("--csv-flush-interval", type=float, default=DEFAULT_FLUSH_INTERVAL,
+                        help="CSV记录最长多久写一次盘(秒)，即崩溃时最多丢失这段时间内的记录")
+    parser.add_argument("--csv-fsync", action="store_true", help="每次写盘后fsync，断电也不丢已写入的行")
+    args = parser.parse_args()
+    if args.queue_size <= 0:
+        parser.error("--queue-size必须大于0")
+    if args.csv_flush_rows <= 0 or args.csv_flush_interval <= 0:
+        parser.error("--csv-flush-rows和--csv-flush-interval必须大于0")
+
+    knx_trigger = None
+    if args.rules:
+        if not args.gateway:
+            parser.error("使用--rules时需要指定--gateway")
+        # 只有使用KNX触发时才需要xknx
+        from nfc_knx_trigger import KNXTrigger, TriggerRules
+        knx_trigger = KNXTrigger(TriggerRules.load(args.rules), args.gateway, args.port, args.local_ip)
+
     root = tk.Tk()
-    app = NFCReaderApp(root)
+    app = NFCReaderApp(root, read_mode=args.read_mode, frame_mode=args.frame_mode,
+                       csv_flush_rows=args.csv_flush_rows, csv_flush_interval=args.csv_flush_interval,
+                       csv_fsync=args.csv_fsync, queue_size=args.queue_size, queue_policy=args.queue_policy,
+                       knx_trigger=knx_trigger)
+    if knx_trigger is not None:
+        knx_trigger.on_error = app.on_trigger_error
+
+        def on_connected(future):
+            if future.exception() is not None:
+                app.on_trigger_error(f"连接KNX路由器失败: {future.exception()}")
+
+        # 启动时就建立隧道，第一次刷卡无需等待握手
+        knx_trigger.start().add_done_callback(on_connected)
     root.protocol("WM_DELETE_WINDOW", app.on_closing)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
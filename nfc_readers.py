@@ -0,0 +1,223 @@
+import os
+import selectors
+import threading
+import time
+
+import serial
+
+from nfc_frame import MODE_FIXED, NFCFrameParser
+
+# 读取模式：阻塞读取在有数据到达时立即唤醒；轮询模式每10ms检查一次
+READ_MODE_BLOCKING = "blocking"
+READ_MODE_POLLING = "polling"
+# 阻塞读取的超时时间(秒)，只用于定期检查是否需要退出
+BLOCKING_READ_TIMEOUT = 0.5
+# POSIX上串口是普通文件描述符，一个线程即可select所有读卡器；Windows上只能每个串口一个线程
+USE_SELECTOR = os.name == "posix"
+
+
+class _Reader:
+    """一个已打开的读卡器"""
+
+    __slots__ = ("port", "serial", "parser", "thread")
+
+    def __init__(self, port, connection, parser):
+        self.port = port
+        self.serial = connection
+        self.parser = parser
+        self.thread = None
+
+
+class SerialReaderPool:
+    """在一个进程中同时读取多个NFC读卡器
+
+    POSIX上所有串口注册到同一个selector，由一个线程读取；其他平台(或轮询模式)
+    每个串口一个读取线程。解析出的帧通过on_frames(串口号, [(卡号, 错误信息)])交给调用方，
+    串口出错时调用on_error(串口号, 错误信息)；每次读取完一批数据后调用一次on_wakeup()。
+    这些回调都在读取线程中执行。
+    """
+
+    def __init__(self, on_frames, on_error, on_wakeup=None, read_mode=READ_MODE_BLOCKING,
+                 frame_mode=MODE_FIXED):
+        self.on_frames = on_frames
+        self.on_error = on_error
+        self.on_wakeup = on_wakeup
+        self.read_mode = read_mode
+        self.frame_mode = frame_mode
+        self.running = False
+        self._readers = {}  # 串口号 -> _Reader
+        self._lock = threading.Lock()
+        self._selector = None
+        self._selector_thread = None
+        self._wakeup_fds = None
+
+    @property
+    def uses_selector(self):
+        return USE_SELECTOR and self.read_mode == READ_MODE_BLOCKING
+
+    @property
+    def ports(self):
+        """正在读取的串口号列表"""
+        with self._lock:
+            return list(self._readers)
+
+    def open(self, ports, baudrate):
+        """打开多个串口并开始读取，返回打开失败的{串口号: 错误信息}"""
+        self.running = True
+        if self.uses_selector and self._selector is None:
+            self._start_selector()
+        errors = {}
+        for port in ports:
+            if port in self._readers:
+                continue
+            try:
+                connection = serial.Serial(
+                    port=port,
+                    baudrate=int(baudrate),
+                    bytesize=serial.EIGHTBITS,
+                    parity=serial.PARITY_NONE,
+                    stopbits=serial.STOPBITS_ONE,
+                    timeout=self._read_timeout()
+                )
+            except (serial.SerialException, ValueError) as e:
+                errors[port] = str(e)
+                continue
+            reader = _Reader(port, connection, NFCFrameParser(self.frame_mode))
+            with self._lock:
+                self._readers[port] = reader
+            if self.uses_selector:
+                self._selector.register(connection, selectors.EVENT_READ, reader)
+                self._wake_selector()
+            else:
+                reader.thread = threading.Thread(
+                    target=self._read_loop,
+                    args=(reader,),
+                    name=f"NFCReader-{port}",
+                    daemon=True
+                )
+                reader.thread.start()
+        return errors
+
+    def close(self):
+        """停止读取并关闭所有串口"""
+        self.running = False
+        with self._lock:
+            readers = list(self._readers.values())
+            self._readers.clear()
+        for reader in readers:
+            try:
+                reader.serial.cancel_read()  # 唤醒阻塞中的读取
+            except Exception:
+                pass
+        if self._selector_thread is not None:
+            self._wake_selector()
+            self._selector_thread.join(timeout=1.0)
+            self._selector_thread = None
+        for reader in readers:
+            if reader.thread is not None and reader.thread.is_alive():
+                reader.thread.join(timeout=1.0)
+            reader.serial.close()
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+            for fd in self._wakeup_fds:
+                os.close(fd)
+            self._wakeup_fds = None
+
+    def _read_timeout(self):
+        if self.uses_selector:
+            return 0  # 只在selector报告可读后读取，不会阻塞
+        if self.read_mode == READ_MODE_BLOCKING:
+            return BLOCKING_READ_TIMEOUT
+        return 1
+
+    def _drop(self, reader, message):
+        """关闭出错的串口并通知调用方，只在读取线程中调用"""
+        with self._lock:
+            if self._readers.get(reader.port) is not reader:
+                return  # 已被close()移除
+            del self._readers[reader.port]
+        if self._selector is not None:
+            self._selector.unregister(reader.serial)
+        reader.serial.close()
+        self.on_error(reader.port, message)
+
+    # ---------- 单线程selector ----------
+
+    def _start_selector(self):
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_fds = os.pipe()
+        os.set_blocking(self._wakeup_fds[0], False)
+        self._selector.register(self._wakeup_fds[0], selectors.EVENT_READ, None)
+        self._selector_thread = threading.Thread(target=self._select_loop, name="NFCReaderSelector",
+                                                 daemon=True)
+        self._selector_thread.start()
+
+    def _wake_selector(self):
+        try:
+            os.write(self._wakeup_fds[1], b"\0")
+        except (OSError, TypeError):
+            pass
+
+    def _select_loop(self):
+        while self.running:
+            received = False
+            for key, _ in self._selector.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wakeup_fds[0], 512)
+                    except BlockingIOError:
+                        pass
+                    continue
+                reader = key.data
+                try:
+                    data = reader.serial.read(reader.serial.in_waiting or 1)
+                except OSError as e:  # SerialException或设备被拔出时的I/O错误
+                    if self.running:
+                        self._drop(reader, f"串口错误: {e}")
+                        received = True
+                    continue
+                frames = reader.parser.feed(data)
+                if frames:
+                    self.on_frames(reader.port, frames)
+                    received = True
+            # 所有读卡器的这一批数据只通知一次
+            if received and self.on_wakeup is not None:
+                self.on_wakeup()
+
+    # ---------- 每个串口一个线程 ----------
+
+    def _read_loop(self, reader):
+        connection = reader.serial
+        try:
+            while self.running and connection.is_open:
+                if self.read_mode == READ_MODE_BLOCKING:
+                    # 阻塞等待第一个字节，数据到达立即返回，空闲时不占用CPU
+                    data = connection.read(1)
+                    if not data:
+                        continue
+                    waiting = connection.in_waiting
+                    if waiting > 0:
+                        data += connection.read(waiting)
+                elif connection.in_waiting > 0:
+                    data = connection.read(connection.in_waiting)
+                else:
+                    # 短暂休眠，避免过度占用CPU
+                    time.sleep(0.01)
+                    continue
+
+                frames = reader.parser.feed(data)
+                if frames:
+                    self.on_frames(reader.port, frames)
+                    if self.on_wakeup is not None:
+                        self.on_wakeup()
+        except OSError as e:  # SerialException或设备被拔出时的I/O错误
+            if self.running:
+                self._drop(reader, f"串口错误: {e}")
+                if self.on_wakeup is not None:
+                    self.on_wakeup()
+        except Exception as e:
+            if self.running:
+                self._drop(reader, f"未知错误: {e}")
+                if self.on_wakeup is not None:
+                    self.on_wakeup()
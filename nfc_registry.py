@@ -0,0 +1,146 @@
+import argparse
+import collections
+import csv
+import os
+import sqlite3
+import threading
+
+DEFAULT_REGISTRY_FILE = "nfc_cards.db"
+# 最多缓存多少张卡的查询结果(包括未登记的卡)
+DEFAULT_CACHE_SIZE = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cards (
+    card_id TEXT PRIMARY KEY,
+    employee_name TEXT NOT NULL DEFAULT '',
+    employee_id TEXT NOT NULL DEFAULT '',
+    permission INTEGER
+) WITHOUT ROWID
+"""
+
+CardInfo = collections.namedtuple("CardInfo", ["employee_name", "employee_id", "permission"])
+
+
+class CardRegistry:
+    """卡号到员工信息的登记表
+
+    保存在SQLite文件中，以卡号为主键，每次查询只读一条记录；第一次查询时才打开数据库，
+    不在启动时读入全部数据。最近查询的结果缓存在内存中，可在多个读取线程中使用。
+    """
+
+    def __init__(self, filename=DEFAULT_REGISTRY_FILE, cache_size=DEFAULT_CACHE_SIZE):
+        self.filename = filename
+        self.cache_size = cache_size
+        self._connection = None
+        self._cache = collections.OrderedDict()  # 卡号 -> CardInfo或None
+        self._lock = threading.Lock()
+
+    def _connect(self, create):
+        if self._connection is None:
+            if not create and not os.path.exists(self.filename):
+                return None
+            self._connection = sqlite3.connect(self.filename, check_same_thread=False)
+            self._connection.execute(SCHEMA)
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+            self._cache.clear()
+
+    def lookup(self, card_id):
+        """返回卡号对应的CardInfo，未登记时返回None"""
+        with self._lock:
+            if card_id in self._cache:
+                self._cache.move_to_end(card_id)
+                return self._cache[card_id]
+            connection = self._connect(create=False)
+            if connection is None:
+                return None  # 还没有登记表文件
+            row = connection.execute(
+                "SELECT employee_name, employee_id, permission FROM cards WHERE card_id = ?",
+                (card_id,)
+            ).fetchone()
+            info = CardInfo(*row) if row else None
+            self._cache[card_id] = info
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return info
+
+    def register(self, card_id, employee_name="", employee_id="", permission=None):
+        """登记或更新一张卡"""
+        self.register_many([(card_id, employee_name, employee_id, permission)])
+
+    def register_many(self, cards):
+        """在一个事务中登记多张卡[(卡号, 姓名, 员工号, 权限)]，返回登记的数量"""
+        with self._lock:
+            connection = self._connect(create=True)
+            with connection:
+                cursor = connection.executemany(
+                    "INSERT INTO cards (card_id, employee_name, employee_id, permission) "
+                    "VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(card_id) DO UPDATE SET employee_name = excluded.employee_name, "
+                    "employee_id = excluded.employee_id, permission = excluded.permission",
+                    ((card_id.upper(), name or "", employee_id or "", permission)
+                     for card_id, name, employee_id, permission in cards)
+                )
+            self._cache.clear()
+            return cursor.rowcount
+
+    def remove(self, card_id):
+        with self._lock:
+            connection = self._connect(create=False)
+            if connection is None:
+                return
+            with connection:
+                connection.execute("DELETE FROM cards WHERE card_id = ?", (card_id.upper(),))
+            self._cache.pop(card_id.upper(), None)
+
+    def __len__(self):
+        with self._lock:
+            connection = self._connect(create=False)
+            if connection is None:
+                return 0
+            return connection.execute("SELECT COUNT(*) FROM cards").fetchone()[0]
+
+
+def load_cards_csv(filename, encoding="utf-8-sig"):
+    """读取登记表CSV: 卡号,姓名,员工号[,权限]，跳过空行、#注释和标题行"""
+    with open(filename, newline="", encoding=encoding) as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#") or row[0].strip() == "卡号":
+                continue
+            row = [cell.strip() for cell in row] + ["", "", ""]
+            permission = int(row[3]) if row[3] else None
+            yield row[0], row[1], row[2], permission
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NFC卡号登记表")
+    parser.add_argument("--db", default=DEFAULT_REGISTRY_FILE, help="登记表文件")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = subparsers.add_parser("import", help="从CSV导入(卡号,姓名,员工号[,权限])")
+    import_parser.add_argument("csvfile", help="CSV文件")
+    import_parser.add_argument("--encoding", default="utf-8-sig", help="CSV文件编码，如GBK")
+
+    lookup_parser = subparsers.add_parser("lookup", help="查询卡号")
+    lookup_parser.add_argument("card_id", help="卡号(16进制)")
+    args = parser.parse_args()
+
+    registry = CardRegistry(args.db)
+    try:
+        if args.command == "import":
+            count = registry.register_many(load_cards_csv(args.csvfile, args.encoding))
+            print(f"已导入 {count} 张卡，登记表共 {len(registry)} 张卡")
+        else:
+            info = registry.lookup(args.card_id.upper())
+            print(info if info else f"卡号 {args.card_id} 未登记")
+    finally:
+        registry.close()
+
+
+if __name__ == "__main__":
+    main()